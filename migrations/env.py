@@ -7,6 +7,8 @@ from sqlalchemy import create_engine
 
 from src.builder.helper import fetch_config
 from src.pkg.db import BaseModel
+from src.pkg.sf_token import SalesforceToken
+from src.worker.dedupe import ProcessedMessage
 
 
 if os.environ.get("APP_ENV", "local") == "local":
@@ -14,6 +16,8 @@ if os.environ.get("APP_ENV", "local") == "local":
 
 MODELS = dict(
     BASE_MODEL=BaseModel,
+    PROCESSED_MESSAGE=ProcessedMessage,
+    SALESFORCE_TOKEN=SalesforceToken,
 )
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
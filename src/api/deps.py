@@ -8,9 +8,10 @@ from starlette.types import ASGIApp
 from uvicorn.protocols.utils import get_path_with_query_string
 
 from src.api import trace_codes
-from src.builder import get_config
+from src.builder import get_clients, get_config
 from src.common.constants import API_KEY_HEADER
 from src.pkg import logging
+from src.pkg.sqs import AsyncSQSMessageSender
 
 api_key_header = APIKeyHeader(name=API_KEY_HEADER)
 logger = logging.get_logger()
@@ -29,6 +30,13 @@ def get_client(hdr_key: Annotated[str, Security(api_key_header)]):
 GetClientDep = Annotated[str, Depends(get_client)]
 
 
+def get_sqs_sender() -> AsyncSQSMessageSender:
+    return get_clients().sqs_sender
+
+
+SqsSenderDep = Annotated[AsyncSQSMessageSender, Depends(get_sqs_sender)]
+
+
 class ErrorMiddleware(BaseHTTPMiddleware):
 
     async def dispatch(
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from ddtrace import patch_all
 
 from src.api.deps import ErrorMiddleware, LoggerInitMiddleware, get_client
+from src.builder import get_clients
 from src.builder.helper import fetch_config, fetch_config_and_build_services
 from src.pkg import logging
 
@@ -27,8 +28,9 @@ patch_all()
 async def lifespan(_: FastAPI):
     fetch_config_and_build_services()
     yield
+    get_clients().sqs_sender.close()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 class HealthCheckModel(BaseModel):
     status: str
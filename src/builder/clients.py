@@ -3,6 +3,7 @@ from typing_extensions import Self
 from src.config.config import Config
 from src.pkg.db import IHandler, PostgresDbHandler
 from src.pkg.s3 import S3Client
+from src.pkg.sqs import AsyncSQSMessageSender
 
 class Clients:
 
@@ -15,3 +16,10 @@ class Clients:
         # pylint: disable=attribute-defined-outside-init
         self.s3_client: S3Client = S3Client(config.aws.s3)
         return self
+
+    def with_sqs_sender(self, config: Config) -> Self:
+        # pylint: disable=attribute-defined-outside-init
+        self.sqs_sender: AsyncSQSMessageSender = AsyncSQSMessageSender(
+            config.aws.sqs, s3_client=getattr(self, "s3_client", None)
+        )
+        return self
@@ -20,7 +20,12 @@ def fetch_config() -> Config:
 
 def build_all_clients(config: Config) -> Clients:
     # TODO: add clients here //NOSONAR
-    return Clients().with_pg_db_handler(config=config)
+    return (
+        Clients()
+        .with_pg_db_handler(config=config)
+        .with_s3_client(config=config)
+        .with_sqs_sender(config=config)
+    )
 
 
 def build_all_services(clients: Clients) -> Services:
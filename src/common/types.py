@@ -13,6 +13,9 @@ class ContentType(str, Enum):
     PDF = "pdf"
     TEXT = "text"
     
+MAGIC_BYTES_LENGTH = 16
+
+
 class MimeType(str, Enum):
     IMAGE_GIF = "image/gif"
     IMAGE_TIFF = "image/tiff"
@@ -75,6 +78,30 @@ class MimeType(str, Enum):
             return mapping[extension]
         raise UnknownMimeTypeError
 
+    @classmethod
+    def from_magic_bytes(cls, data: bytes) -> "MimeType":
+        """Detects the mime type from the leading bytes of a file, at least
+        MAGIC_BYTES_LENGTH bytes are needed to tell all types apart.
+
+        Raises:
+            UnknownMimeTypeError: if no known signature matches
+        """
+        if data.startswith(b"%PDF-"):
+            return cls.PDF
+        if data.startswith(b"\x89PNG\r\n\x1a\n"):
+            return cls.IMAGE_PNG
+        if data.startswith(b"\xff\xd8\xff"):
+            return cls.IMAGE_JPEG
+        if data.startswith((b"GIF87a", b"GIF89a")):
+            return cls.IMAGE_GIF
+        if data.startswith((b"II*\x00", b"MM\x00*")):
+            return cls.IMAGE_TIFF
+        if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+            return cls.IMAGE_WEBP
+        if data.startswith(b"BM"):
+            return cls.IMAGE_BMP
+        raise UnknownMimeTypeError
+
     def content_type(self) -> ContentType:
         if self in {
             MimeType.IMAGE_GIF,
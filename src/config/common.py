@@ -1,4 +1,6 @@
-from pydantic import BaseModel, NonNegativeInt, PositiveInt
+from typing import Optional
+
+from pydantic import BaseModel, NonNegativeInt, PositiveFloat, PositiveInt
 
 
 class ExpRetryConfig(BaseModel):
@@ -7,3 +9,14 @@ class ExpRetryConfig(BaseModel):
     exponent: NonNegativeInt
     jitter_ms: PositiveInt
     interval_cap_ms: PositiveInt
+
+
+class RateLimitConfig(BaseModel):
+    rate_per_sec: PositiveFloat
+    burst: PositiveInt = 1
+    max_wait_sec: Optional[PositiveFloat] = None
+
+
+class CircuitBreakerConfig(BaseModel):
+    failure_threshold: PositiveInt = 5
+    reset_timeout_sec: PositiveFloat = 30
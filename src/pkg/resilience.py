@@ -0,0 +1,172 @@
+"""
+This module provides client side protections for calls to external APIs.
+
+- full_jitter_backoff_ms and JitteredRetry spread retries of many clients over
+  the whole backoff window instead of firing them in lockstep.
+- TokenBucket keeps the call rate of a client under an API limit.
+- CircuitBreaker fails calls fast while the API keeps failing, and lets a
+  single probe through once the reset timeout passed.
+"""
+
+import random
+import threading
+import time
+from enum import Enum
+from itertools import takewhile
+from typing import Any, Optional
+
+from urllib3.util.retry import Retry
+
+from src.config.common import CircuitBreakerConfig, ExpRetryConfig, RateLimitConfig
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class RateLimitTimeoutError(Exception):
+    pass
+
+
+def full_jitter_backoff_ms(config: ExpRetryConfig, attempt: int) -> float:
+    """
+    Returns the delay before retry number attempt (starting at 1). The delay
+    is drawn uniformly below interval_ms * exponent ** (attempt - 1), capped
+    at interval_cap_ms, plus up to jitter_ms of extra spread.
+    """
+    growth = max(config.exponent, 1) ** max(attempt - 1, 0)
+    ceiling = min(config.interval_ms * growth, config.interval_cap_ms)
+    delay = random.uniform(0, ceiling) + random.uniform(0, config.jitter_ms)
+    return min(delay, config.interval_cap_ms)
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry which sleeps with full_jitter_backoff_ms between retries."""
+
+    def __init__(self, backoff_config: Optional[ExpRetryConfig] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.backoff_config = backoff_config
+
+    def new(self, **kw: Any) -> "JitteredRetry":
+        retry = super().new(**kw)
+        retry.backoff_config = self.backoff_config
+        return retry
+
+    def get_backoff_time(self) -> float:
+        if self.backoff_config is None:
+            return super().get_backoff_time()
+        consecutive_errors_len = len(
+            list(
+                takewhile(lambda x: x.redirect_location is None, reversed(self.history))
+            )
+        )
+        if consecutive_errors_len == 0:
+            return 0
+        return (
+            full_jitter_backoff_ms(self.backoff_config, consecutive_errors_len) / 1000
+        )
+
+
+class TokenBucket:
+    def __init__(self, config: RateLimitConfig) -> None:
+        self._rate = config.rate_per_sec
+        self._capacity = float(config.burst)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Takes tokens if they are available. Returns 0 on success, otherwise
+        the seconds until enough tokens will have accumulated.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self._rate
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until tokens are available, or raises RateLimitTimeoutError.
+        The wait holds the calling thread, also when it runs the work of an
+        asyncio handler through asyncio.to_thread.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitTimeoutError
+            time.sleep(wait)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, config: CircuitBreakerConfig) -> None:
+        self._failure_threshold = config.failure_threshold
+        self._reset_timeout_sec = config.reset_timeout_sec
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        Raises CircuitOpenError while the circuit is open. After the reset
+        timeout one caller is let through to probe the API, the others keep
+        failing fast until the probe reported its outcome.
+        """
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return
+            if self._state == CircuitState.OPEN:
+                if time.monotonic() - self._opened_at < self._reset_timeout_sec:
+                    raise CircuitOpenError
+                self._state = CircuitState.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                raise CircuitOpenError
+            self._probing = True
+
+    def release(self) -> None:
+        """
+        Gives up the call let through by before_call without reporting an
+        outcome, e.g. when it was not sent. Another caller may then probe.
+        """
+        with self._lock:
+            self._probing = False
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == CircuitState.HALF_OPEN
+                or self._failures >= self._failure_threshold
+            ):
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
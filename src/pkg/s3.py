@@ -1,17 +1,48 @@
-from dataclasses import dataclass
+import io
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import IO, Any, Callable, Iterator, List, Optional, TypeVar, Union
 from urllib.parse import ParseResult, urlparse
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
 from mypy_boto3_s3 import S3Client as BotoS3Client
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveInt
 
-from src.common.types import MimeType
+from src.common.types import (
+    MAGIC_BYTES_LENGTH,
+    ContentType,
+    MimeType,
+    UnknownMimeTypeError,
+)
+from src.pkg.s3_cache import (
+    S3CacheConfig,
+    S3CacheEntry,
+    S3CacheStats,
+    S3DiskCache,
+    map_file,
+)
 
 
 class AwsS3Config(BaseModel):
     endpoint_url: Optional[str] = None
+    max_workers: PositiveInt = 8
+    download_chunk_size: PositiveInt = 1024 * 1024
+    spool_max_memory_bytes: PositiveInt = 8 * 1024 * 1024
+    cache: Optional[S3CacheConfig] = None
+    multipart_threshold_bytes: PositiveInt = 8 * 1024 * 1024
+    multipart_chunk_size_bytes: PositiveInt = 8 * 1024 * 1024
+    transfer_concurrency: PositiveInt = 10
 
 
 class S3Url:
@@ -39,11 +70,140 @@ class S3Response:
     file_data: bytes
 
 
+@dataclass
+class S3ProbeResult:
+    """
+    What is known about an object without downloading it. mime_type and
+    content_type are None when the type is not supported.
+    """
+
+    file_name: str
+    mime_type: Optional[MimeType]
+    content_type: Optional[ContentType]
+    size: int
+    etag: str = ""
+    sniffed: bool = False
+
+
+@dataclass
+class S3MappedResponse:
+    """
+    A cached object mapped into memory. file_data supports slicing and the
+    buffer protocol like bytes, and must be released with close.
+    """
+
+    file_name: str
+    mime_type: MimeType
+    file_data: Union[mmap.mmap, bytes]
+
+    def close(self) -> None:
+        if isinstance(self.file_data, mmap.mmap):
+            self.file_data.close()
+
+    def __enter__(self) -> "S3MappedResponse":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+@dataclass
+class S3StreamResponse:
+    """
+    An object opened for reading without loading it into memory. body is a
+    file-like object, either the HTTP stream of the GET or a spooled temporary
+    file, and must be closed, use the response as a context manager.
+    """
+
+    file_name: str
+    mime_type: MimeType
+    content_length: int
+    body: IO[bytes]
+    chunk_size: int = 1024 * 1024
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self.body.read() if amt is None else self.body.read(amt)
+
+    def iter_chunks(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        size = chunk_size or self.chunk_size
+        while True:
+            chunk = self.body.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        self.body.close()
+
+    def __enter__(self) -> "S3StreamResponse":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+@dataclass
+class S3Object:
+    key: str
+    size: int = 0
+    etag: str = ""
+
+
+@dataclass
+class S3TransferSummary:
+    file_names: List[str] = field(default_factory=list)
+    transferred_objects: int = 0
+    transferred_bytes: int = 0
+    skipped_objects: int = 0
+    skipped_bytes: int = 0
+    elapsed_sec: float = 0.0
+    failed: List["S3OperationResult"] = field(default_factory=list)
+
+    @property
+    def throughput_bytes_per_sec(self) -> float:
+        if self.elapsed_sec <= 0:
+            return 0.0
+        return self.transferred_bytes / self.elapsed_sec
+
+
+@dataclass
+class S3OperationResult:
+    key: str
+    destination_key: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+MANIFEST_FILE_NAME = ".s3-manifest.json"
+MAX_POOL_CONNECTIONS = 100
+MAX_DELETE_KEYS = 1000
+CACHE_READ_ATTEMPTS = 2
+
+T = TypeVar("T")
+
+
 class S3Client:
     def __init__(self, cfg: AwsS3Config):
+        self.config = cfg
         self.client: BotoS3Client = boto3.client(  # type: ignore
             "s3",
             endpoint_url=cfg.endpoint_url,
+            # every parallel transfer may run transfer_concurrency part requests
+            config=BotoConfig(
+                max_pool_connections=min(
+                    max(10, cfg.max_workers * cfg.transfer_concurrency),
+                    MAX_POOL_CONNECTIONS,
+                )
+            ),
+        )
+        self.cache = S3DiskCache(cfg.cache) if cfg.cache is not None else None
+        self.transfer_config = TransferConfig(
+            multipart_threshold=cfg.multipart_threshold_bytes,
+            multipart_chunksize=cfg.multipart_chunk_size_bytes,
+            max_concurrency=cfg.transfer_concurrency,
         )
 
     def download_via_url(
@@ -51,67 +211,573 @@ class S3Client:
     ) -> S3Response:
 
         s3_url_components = S3Url(file_url=file_url)
+        if self.cache is not None:
+            content_type, original_name, data = self._read_cached(
+                s3_url_components, Path.read_bytes
+            )
+            file_name, mime_type = self._describe_cached(
+                content_type, original_name, s3_url_components, return_as_text
+            )
+            return S3Response(
+                file_name=file_name,
+                mime_type=mime_type,
+                file_data=data,
+            )
+
         response_obj = self.client.get_object(
             Bucket=s3_url_components.bucket,
             Key=s3_url_components.key,
         )
 
-        content_type = response_obj.get("ContentType")
         file_content = response_obj.get("Body").read()
+        file_name, mime_type = self._describe(
+            response_obj, s3_url_components, return_as_text
+        )
+        return S3Response(
+            file_name=file_name,
+            mime_type=mime_type,
+            file_data=file_content,
+        )
+
+    def probe(self, file_url: str, sniff: bool = False) -> S3ProbeResult:
+        """
+        Resolves the type, size and file name of an object with a HeadObject
+        call, so that unsupported files can be rejected before downloading
+        them.
+
+        :param file_url: URL of the object
+        :param sniff: Whether to read the first bytes of the object and detect
+            the type from its signature. Sniffing also happens when the stored
+            content type and file name do not resolve to a known type.
+        :return: S3ProbeResult
+        """
+        s3_url_components = S3Url(file_url=file_url)
+        head = self.client.head_object(
+            Bucket=s3_url_components.bucket,
+            Key=s3_url_components.key,
+        )
         file_name = (
-            response_obj.get("Metadata").get("original-filename")
+            head.get("Metadata", {}).get("original-filename")
             or s3_url_components.file_name
         )
-        if return_as_text:
-            return S3Response(
-                file_name=file_name,
-                mime_type=MimeType.TEXT,
-                file_data=file_content,
+        size = head.get("ContentLength", 0)
+
+        mime_type: Optional[MimeType] = None
+        try:
+            mime_type = MimeType.parse(head.get("ContentType", ""), file_name)
+        except UnknownMimeTypeError:
+            pass
+
+        sniffed = False
+        if size > 0 and (sniff or mime_type is None):
+            header = self.client.get_object(
+                Bucket=s3_url_components.bucket,
+                Key=s3_url_components.key,
+                Range=f"bytes=0-{MAGIC_BYTES_LENGTH - 1}",
+            )["Body"].read()
+            try:
+                mime_type = MimeType.from_magic_bytes(header)
+                sniffed = True
+            except UnknownMimeTypeError:
+                pass
+
+        return S3ProbeResult(
+            file_name=file_name,
+            mime_type=mime_type,
+            content_type=mime_type.content_type() if mime_type else None,
+            size=size,
+            etag=head.get("ETag", ""),
+            sniffed=sniffed,
+        )
+
+    def map_via_url(
+        self, file_url: str, return_as_text: bool = False
+    ) -> S3MappedResponse:
+        """
+        Serves an object from the disk cache, memory mapped so that the
+        processes of a host share one copy of it in the page cache. The object
+        is downloaded into the cache first if it is missing or changed. Objects
+        larger than the cache are not cached and returned as bytes.
+
+        :param file_url: URL of the object
+        :param return_as_text: Whether to report the object as text
+        :return: S3MappedResponse, to be closed by the caller
+        """
+        if self.cache is None:
+            raise ValueError("map_via_url requires aws.s3.cache to be configured")
+        s3_url_components = S3Url(file_url=file_url)
+        content_type, original_name, data = self._read_cached(
+            s3_url_components, map_file
+        )
+        file_name, mime_type = self._describe_cached(
+            content_type, original_name, s3_url_components, return_as_text
+        )
+        return S3MappedResponse(
+            file_name=file_name,
+            mime_type=mime_type,
+            file_data=data,
+        )
+
+    def cache_stats(self) -> Optional[S3CacheStats]:
+        return self.cache.stats() if self.cache is not None else None
+
+    def _read_cached(
+        self, s3_url_components: S3Url, read: Callable[[Path], T]
+    ) -> tuple[Optional[str], Optional[str], Union[T, bytes]]:
+        """
+        Reads an object through the disk cache and returns its content type,
+        original file name and data. Objects larger than the cache are read
+        without caching them. Another process can evict an entry between the
+        lookup and the read, the object is then downloaded again.
+        """
+        for _ in range(CACHE_READ_ATTEMPTS):
+            cached = self._fetch_cached(s3_url_components)
+            if isinstance(cached, S3CacheEntry):
+                try:
+                    return cached.content_type, cached.file_name, read(cached.path)
+                except FileNotFoundError:
+                    continue
+            else:
+                response_obj = cached
+                break
+        else:
+            response_obj = self.client.get_object(
+                Bucket=s3_url_components.bucket, Key=s3_url_components.key
             )
+        with closing(response_obj["Body"]) as body:
+            data = body.read()
+        return (
+            response_obj.get("ContentType"),
+            response_obj.get("Metadata", {}).get("original-filename"),
+            data,
+        )
 
-        return S3Response(
+    def _fetch_cached(
+        self, s3_url_components: S3Url
+    ) -> Union[S3CacheEntry, dict[str, Any]]:
+        """
+        Returns the cache entry of an object, downloading it if it is missing
+        or changed, or the unread GetObject response of an object which is
+        too large to be cached.
+        """
+        assert self.cache is not None
+        bucket, key = s3_url_components.bucket, s3_url_components.key
+        entry = self.cache.lookup(bucket, key)
+        if entry is not None and not self.cache.config.revalidate:
+            self.cache.hit(entry)
+            return entry
+
+        kwargs: dict[str, Any] = {}
+        if entry is not None:
+            kwargs["IfNoneMatch"] = entry.etag
+        try:
+            response_obj = self.client.get_object(Bucket=bucket, Key=key, **kwargs)
+        except ClientError as err:
+            # an unchanged object is answered with 304 Not Modified and no body
+            status = err.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if entry is not None and (
+                status == 304 or err.response.get("Error", {}).get("Code") == "304"
+            ):
+                self.cache.hit(entry, revalidated=True)
+                return entry
+            raise
+
+        self.cache.miss()
+        if response_obj.get("ContentLength", 0) > self.cache.config.max_bytes:
+            return response_obj  # type: ignore
+        body = response_obj["Body"]
+        chunk_size = self.config.download_chunk_size
+        try:
+            return self.cache.store(
+                bucket,
+                key,
+                etag=response_obj.get("ETag", ""),
+                chunks=iter(lambda: body.read(chunk_size), b""),
+                content_type=response_obj.get("ContentType"),
+                file_name=response_obj.get("Metadata", {}).get("original-filename"),
+            )
+        finally:
+            body.close()
+
+    def open_via_url(
+        self,
+        file_url: str,
+        return_as_text: bool = False,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> S3StreamResponse:
+        """
+        Opens an object for streaming, the memory used does not depend on
+        the object size as long as the body is consumed in chunks.
+
+        :param file_url: URL of the object
+        :param return_as_text: Whether to report the object as text
+        :param start: First byte to read, reads a range of the object when set
+        :param end: Last byte to read (inclusive), the end of the object if None
+        :return: S3StreamResponse, to be closed by the caller
+        """
+        s3_url_components = S3Url(file_url=file_url)
+        kwargs: dict[str, Any] = {}
+        if start is not None or end is not None:
+            kwargs["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+        response_obj = self.client.get_object(
+            Bucket=s3_url_components.bucket,
+            Key=s3_url_components.key,
+            **kwargs,
+        )
+        file_name, mime_type = self._describe(
+            response_obj, s3_url_components, return_as_text
+        )
+        return S3StreamResponse(
             file_name=file_name,
-            mime_type=MimeType.parse(content_type, file_name),
-            file_data=file_content,
+            mime_type=mime_type,
+            content_length=response_obj.get("ContentLength", 0),
+            body=response_obj["Body"],  # type: ignore
+            chunk_size=self.config.download_chunk_size,
         )
 
+    def download_range(self, file_url: str, start: int, end: int) -> bytes:
+        """Reads the bytes start to end (inclusive) of an object."""
+        with self.open_via_url(file_url, start=start, end=end) as response:
+            return response.read()
+
+    def spool_via_url(
+        self, file_url: str, return_as_text: bool = False
+    ) -> S3StreamResponse:
+        """
+        Downloads an object into a temporary file which stays in memory up to
+        spool_max_memory_bytes and rolls over to disk beyond that. Unlike
+        open_via_url the body is seekable and the connection is released
+        before returning.
+        """
+        spool = tempfile.SpooledTemporaryFile(  # pylint: disable=consider-using-with
+            max_size=self.config.spool_max_memory_bytes
+        )
+        try:
+            with self.open_via_url(file_url, return_as_text) as response:
+                for chunk in response.iter_chunks():
+                    spool.write(chunk)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return S3StreamResponse(
+            file_name=response.file_name,
+            mime_type=response.mime_type,
+            content_length=response.content_length,
+            body=spool,  # type: ignore
+            chunk_size=self.config.download_chunk_size,
+        )
+
+    @staticmethod
+    def _describe(
+        response_obj: Any, s3_url_components: S3Url, return_as_text: bool
+    ) -> tuple[str, MimeType]:
+        file_name = (
+            response_obj.get("Metadata").get("original-filename")
+            or s3_url_components.file_name
+        )
+        if return_as_text:
+            return file_name, MimeType.TEXT
+        return file_name, MimeType.parse(response_obj.get("ContentType"), file_name)
+
+    @staticmethod
+    def _describe_cached(
+        content_type: Optional[str],
+        original_name: Optional[str],
+        s3_url_components: S3Url,
+        return_as_text: bool,
+    ) -> tuple[str, MimeType]:
+        file_name = original_name or s3_url_components.file_name
+        if return_as_text:
+            return file_name, MimeType.TEXT
+        return file_name, MimeType.parse(content_type, file_name)
+
     def upload_file(self, file_path: str, bucket: str, key: str) -> None:
-        self.client.upload_file(Filename=file_path, Bucket=bucket, Key=key)
+        self.client.upload_file(
+            Filename=file_path, Bucket=bucket, Key=key, Config=self.transfer_config
+        )
+
+    def upload_bytes(
+        self,
+        data: bytes,
+        bucket: str,
+        key: str,
+        content_type: Optional[str] = None,
+    ) -> None:
+        self.upload_stream(io.BytesIO(data), bucket, key, content_type)
+
+    def upload_stream(
+        self,
+        stream: IO[bytes],
+        bucket: str,
+        key: str,
+        content_type: Optional[str] = None,
+    ) -> None:
+        """
+        Uploads a readable binary stream, in parts once it exceeds the
+        multipart threshold, without writing it to a temporary file.
+        """
+        self.client.upload_fileobj(
+            stream,
+            bucket,
+            key,
+            ExtraArgs={"ContentType": content_type} if content_type else None,
+            Config=self.transfer_config,
+        )
+
+    def upload_many(
+        self,
+        bucket: str,
+        source: Union[str, List[tuple[str, bytes]]],
+        prefix: str = "",
+        max_workers: Optional[int] = None,
+    ) -> S3TransferSummary:
+        """
+        Uploads a directory or a list of in-memory buffers in parallel.
+
+        :param bucket: The name of the S3 bucket
+        :param source: A local directory, uploaded recursively with the paths
+            relative to it as keys, or (key, data) pairs
+        :param prefix: Prepended to every key
+        :param max_workers: Number of parallel uploads, AwsS3Config.max_workers if None
+        :return: Summary of the objects and bytes uploaded, failed uploads are
+            listed in failed instead of being raised
+        """
+        started = time.monotonic()
+        if isinstance(source, str):
+            root = Path(source)
+            items: List[tuple[str, Any]] = [
+                (path.relative_to(root).as_posix(), path)
+                for path in sorted(root.rglob("*"))
+                if path.is_file()
+            ]
+        else:
+            items = list(source)
+        summary = S3TransferSummary(file_names=[prefix + key for key, _ in items])
+        lock = threading.Lock()
+
+        def upload(item: tuple[str, Any]) -> None:
+            key, data = item
+            try:
+                if isinstance(data, Path):
+                    size = data.stat().st_size
+                    self.upload_file(str(data), bucket, prefix + key)
+                else:
+                    size = len(data)
+                    self.upload_bytes(data, bucket, prefix + key)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                with lock:
+                    summary.failed.append(
+                        S3OperationResult(key=prefix + key, error=repr(err))
+                    )
+                return
+            with lock:
+                summary.transferred_objects += 1
+                summary.transferred_bytes += size
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or self.config.max_workers
+        ) as executor:
+            list(executor.map(upload, items))
+        summary.failed.sort(key=lambda result: result.key)
+        summary.elapsed_sec = time.monotonic() - started
+        return summary
 
     def _get_file_list_in_bucket(
         self, bucket_name, prefix="", file_name_filter=""
     ) -> List:
-        file_names = []
-        default_kwargs = {"Bucket": bucket_name, "Prefix": prefix}
-        next_token = ""
-        while next_token is not None:
-            updated_kwargs = default_kwargs.copy()
-            if next_token != "":
-                updated_kwargs["ContinuationToken"] = next_token
-            response = self.client.list_objects_v2(**default_kwargs)
-            contents = response.get("Contents")
-            for result in contents:  # type: ignore
-                key = result.get("Key")
-                if file_name_filter in key:  # type: ignore
-                    file_names.append(key)
+        return [
+            obj.key
+            for obj in self._get_objects_in_bucket(
+                bucket_name, prefix=prefix, file_name_filter=file_name_filter
+            )
+        ]
+
+    def _get_objects_in_bucket(
+        self, bucket_name, prefix="", file_name_filter=""
+    ) -> List[S3Object]:
+        return list(
+            self.iter_objects(
+                bucket_name, prefix=prefix, file_name_filter=file_name_filter
+            )
+        )
+
+    def iter_objects(
+        self,
+        bucket_name: str,
+        prefix: str = "",
+        file_name_filter: str = "",
+        delimiter: Optional[str] = None,
+    ) -> Iterator[S3Object]:
+        """
+        Lazily lists the objects below prefix whose key contains
+        file_name_filter, fetching the next page only once the previous one
+        was consumed.
+
+        :param delimiter: Only list objects directly below prefix, keys
+            containing the delimiter after the prefix are rolled up into
+            common prefixes, see iter_prefixes.
+        """
+        for page in self._iter_pages(bucket_name, prefix, delimiter):
+            for result in page.get("Contents", []):
+                key = result.get("Key", "")
+                if file_name_filter in key:
+                    yield S3Object(
+                        key=key,
+                        size=result.get("Size", 0),
+                        etag=result.get("ETag", ""),
+                    )
+
+    def iter_prefixes(
+        self, bucket_name: str, prefix: str = "", delimiter: str = "/"
+    ) -> Iterator[str]:
+        """Lazily lists the common prefixes directly below prefix."""
+        for page in self._iter_pages(bucket_name, prefix, delimiter):
+            for common_prefix in page.get("CommonPrefixes", []):
+                yield common_prefix["Prefix"]
+
+    def iter_objects_parallel(
+        self,
+        bucket_name: str,
+        prefix: str = "",
+        file_name_filter: str = "",
+        delimiter: str = "/",
+        max_workers: Optional[int] = None,
+    ) -> Iterator[S3Object]:
+        """
+        Lists very large buckets by fanning out over the common prefixes
+        directly below prefix and listing each of them on a thread pool.
+        Objects are yielded per sub prefix, in the order the listings finish.
+        """
+        sub_prefixes = []
+        for page in self._iter_pages(bucket_name, prefix, delimiter):
+            for result in page.get("Contents", []):
+                key = result.get("Key", "")
+                if file_name_filter in key:
+                    yield S3Object(
+                        key=key,
+                        size=result.get("Size", 0),
+                        etag=result.get("ETag", ""),
+                    )
+            sub_prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+
+        def list_prefix(sub_prefix: str) -> List[S3Object]:
+            return list(
+                self.iter_objects(
+                    bucket_name, prefix=sub_prefix, file_name_filter=file_name_filter
+                )
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or self.config.max_workers
+        ) as executor:
+            futures = [executor.submit(list_prefix, p) for p in sub_prefixes]
+            for future in as_completed(futures):
+                yield from future.result()
+
+    def _iter_pages(
+        self, bucket_name: str, prefix: str, delimiter: Optional[str] = None
+    ) -> Iterator[Any]:
+        kwargs: dict[str, Any] = {"Bucket": bucket_name, "Prefix": prefix}
+        if delimiter:
+            kwargs["Delimiter"] = delimiter
+        while True:
+            response = self.client.list_objects_v2(**kwargs)
+            yield response
             next_token = response.get("NextContinuationToken")
-        return file_names
+            if not response.get("IsTruncated") or not next_token:
+                return
+            kwargs["ContinuationToken"] = next_token
 
     def download_all_files_from_bucket(
-        self, bucket_name: str, local_path: str, prefix: str, file_name_filter: str
-    ):
+        self,
+        bucket_name: str,
+        local_path: str,
+        prefix: str,
+        file_name_filter: str,
+        max_workers: Optional[int] = None,
+        incremental: bool = False,
+    ) -> S3TransferSummary:
+        """
+        Downloads every object below prefix whose key contains file_name_filter
+        into local_path, keeping the key as relative path.
 
+        :param max_workers: Number of parallel downloads, defaults to the
+            max_workers of the config. Use 1 for serial downloads.
+        :param incremental: Skip objects which are unchanged since the last
+            sync, according to the manifest kept in local_path.
+        :return: Summary of the objects and bytes transferred and skipped.
+        """
+        started = time.monotonic()
         local_path = Path(local_path)  # type: ignore
-        file_names = self._get_file_list_in_bucket(
+        objects = self._get_objects_in_bucket(
             bucket_name=bucket_name, prefix=prefix, file_name_filter=file_name_filter
         )
-        for file_name in file_names:
-            if file_name_filter not in file_name:
-                continue
-            file_path = Path.joinpath(local_path, file_name)  # type: ignore
+        summary = S3TransferSummary(file_names=[obj.key for obj in objects])
+        manifest_path = Path.joinpath(local_path, MANIFEST_FILE_NAME)  # type: ignore
+        manifest = self._load_manifest(manifest_path) if incremental else {}
+        lock = threading.Lock()
+
+        def download(obj: S3Object) -> None:
+            file_path = Path.joinpath(local_path, obj.key)  # type: ignore
+            if incremental and self._is_unchanged(obj, file_path, manifest.get(obj.key)):
+                with lock:
+                    summary.skipped_objects += 1
+                    summary.skipped_bytes += obj.size
+                return
             file_path.parent.mkdir(parents=True, exist_ok=True)
-            self.client.download_file(bucket_name, file_name, str(file_path))
-        return file_names
+            self.client.download_file(
+                bucket_name, obj.key, str(file_path), Config=self.transfer_config
+            )
+            with lock:
+                summary.transferred_objects += 1
+                summary.transferred_bytes += obj.size
+                manifest[obj.key] = {
+                    "etag": obj.etag,
+                    "size": obj.size,
+                    "mtime": file_path.stat().st_mtime,
+                }
+
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max_workers or self.config.max_workers
+            ) as executor:
+                # list() surfaces the first failed download
+                list(executor.map(download, objects))
+        finally:
+            if incremental:
+                self._save_manifest(manifest_path, manifest)
+        summary.elapsed_sec = time.monotonic() - started
+        return summary
+
+    @staticmethod
+    def _is_unchanged(
+        obj: S3Object, file_path: Path, entry: Optional[dict[str, Any]]
+    ) -> bool:
+        if entry is None or not file_path.is_file():
+            return False
+        stat = file_path.stat()
+        return (
+            entry.get("etag") == obj.etag
+            and entry.get("size") == obj.size == stat.st_size
+            and entry.get("mtime") == stat.st_mtime
+        )
+
+    @staticmethod
+    def _load_manifest(manifest_path: Path) -> dict[str, Any]:
+        if not manifest_path.is_file():
+            return {}
+        with open(manifest_path, "rb") as file:
+            return json.load(file)
+
+    @staticmethod
+    def _save_manifest(manifest_path: Path, manifest: dict[str, Any]) -> None:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(tmp_path, manifest_path)
 
     def move_s3_file(self, bucket_name, source_key, destination_key) -> None:
         """
@@ -124,3 +790,97 @@ class S3Client:
         copy_source = {"Bucket": bucket_name, "Key": source_key}
         self.client.copy(copy_source, bucket_name, destination_key)  # type: ignore
         self.client.delete_object(Bucket=bucket_name, Key=source_key)
+
+    def copy_many(
+        self,
+        bucket_name: str,
+        keys: List[tuple[str, str]],
+        destination_bucket: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[S3OperationResult]:
+        """
+        Copies objects concurrently on a bounded pool.
+
+        :param bucket_name: The name of the source bucket
+        :param keys: (source_key, destination_key) pairs
+        :param destination_bucket: The bucket to copy to, the source bucket if None
+        :param max_workers: Number of parallel copies, AwsS3Config.max_workers if None
+        :return: One result per pair, in the order of keys
+        """
+        target_bucket = destination_bucket or bucket_name
+
+        def copy(pair: tuple[str, str]) -> S3OperationResult:
+            source_key, destination_key = pair
+            try:
+                self.client.copy(  # type: ignore
+                    {"Bucket": bucket_name, "Key": source_key},
+                    target_bucket,
+                    destination_key,
+                )
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                return S3OperationResult(
+                    key=source_key, destination_key=destination_key, error=repr(err)
+                )
+            return S3OperationResult(key=source_key, destination_key=destination_key)
+
+        if not keys:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=max_workers or self.config.max_workers
+        ) as executor:
+            return list(executor.map(copy, keys))
+
+    def delete_many(self, bucket_name: str, keys: List[str]) -> List[S3OperationResult]:
+        """
+        Deletes objects with DeleteObjects calls of up to 1000 keys.
+
+        :param bucket_name: The name of the S3 bucket
+        :param keys: Keys to delete
+        :return: One result per key, in the order of keys
+        """
+        errors: dict[str, str] = {}
+        for i in range(0, len(keys), MAX_DELETE_KEYS):
+            chunk = keys[i : i + MAX_DELETE_KEYS]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+                )
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                errors.update((key, repr(err)) for key in chunk)
+                continue
+            # in quiet mode only the keys which could not be deleted are listed
+            for error in response.get("Errors", []):
+                errors[error.get("Key", "")] = (
+                    f"{error.get('Code')}: {error.get('Message')}"
+                )
+        return [S3OperationResult(key=key, error=errors.get(key)) for key in keys]
+
+    def move_many(
+        self,
+        bucket_name: str,
+        keys: List[tuple[str, str]],
+        destination_bucket: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ) -> List[S3OperationResult]:
+        """
+        Moves objects by copying them concurrently and deleting the copied
+        sources in bulk. A source is only deleted once its copy succeeded.
+
+        :param bucket_name: The name of the source bucket
+        :param keys: (source_key, destination_key) pairs
+        :param destination_bucket: The bucket to move to, the source bucket if None
+        :param max_workers: Number of parallel copies, AwsS3Config.max_workers if None
+        :return: One result per pair, in the order of keys
+        """
+        results = self.copy_many(bucket_name, keys, destination_bucket, max_workers)
+        copied = [result.key for result in results if result.success]
+        delete_errors = {
+            result.key: result.error
+            for result in self.delete_many(bucket_name, copied)
+            if not result.success
+        }
+        for result in results:
+            if result.key in delete_errors:
+                result.error = f"copied but not deleted: {delete_errors[result.key]}"
+        return results
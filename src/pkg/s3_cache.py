@@ -0,0 +1,187 @@
+"""
+This module provides an on-disk cache for S3 objects.
+
+Entries are keyed by bucket and key and remember the ETag of the object they
+hold, so that a changed object is detected with a conditional GET instead of
+being downloaded again. The cache directory is shared by all processes on the
+host. Entries are replaced atomically and the least recently used ones are
+evicted once the directory grows beyond the configured size.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
+
+from pydantic import BaseModel, PositiveInt
+
+DATA_SUFFIX = ".data"
+META_SUFFIX = ".json"
+
+
+class S3CacheConfig(BaseModel):
+    directory: str
+    max_bytes: PositiveInt = 1024 * 1024 * 1024
+    revalidate: bool = True
+
+
+@dataclass
+class S3CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    evictions: int = 0
+    evicted_bytes: int = 0
+
+
+@dataclass
+class S3CacheEntry:
+    path: Path
+    etag: str
+    content_type: Optional[str]
+    file_name: Optional[str]
+    size: int
+
+
+def map_file(path: Path) -> Union[mmap.mmap, bytes]:
+    """
+    Maps a cached file read only, processes mapping the same file share its
+    pages. mmap cannot map empty files, those are returned as empty bytes.
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class S3DiskCache:
+    def __init__(self, config: S3CacheConfig) -> None:
+        self.config = config
+        self._directory = Path(config.directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._stats = S3CacheStats()
+        self._lock = threading.Lock()
+
+    def stats(self) -> S3CacheStats:
+        with self._lock:
+            return S3CacheStats(**self._stats.__dict__)
+
+    def lookup(self, bucket: str, key: str) -> Optional[S3CacheEntry]:
+        """Returns the cached entry of an object, without counting a hit."""
+        data_path, meta_path = self._paths(bucket, key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            size = data_path.stat().st_size
+        except (OSError, ValueError):
+            return None
+        if size != meta.get("size"):
+            # the data file was replaced or truncated after the metadata
+            return None
+        return S3CacheEntry(
+            path=data_path,
+            etag=meta["etag"],
+            content_type=meta.get("content_type"),
+            file_name=meta.get("file_name"),
+            size=size,
+        )
+
+    def hit(self, entry: S3CacheEntry, revalidated: bool = False) -> None:
+        # the modification time orders the entries for eviction
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+        with self._lock:
+            self._stats.hits += 1
+            if revalidated:
+                self._stats.revalidations += 1
+
+    def miss(self) -> None:
+        with self._lock:
+            self._stats.misses += 1
+
+    def store(
+        self,
+        bucket: str,
+        key: str,
+        etag: str,
+        chunks: Iterable[bytes],
+        content_type: Optional[str] = None,
+        file_name: Optional[str] = None,
+    ) -> S3CacheEntry:
+        """
+        Writes an object to the cache. The data is written to a temporary
+        file and renamed, so readers never see a partially written entry. The
+        stored entry itself is not evicted, callers skip objects larger than
+        max_bytes.
+        """
+        data_path, meta_path = self._paths(bucket, key)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_data = data_path.with_name(data_path.name + suffix)
+        tmp_meta = meta_path.with_name(meta_path.name + suffix)
+        try:
+            size = 0
+            with open(tmp_data, "wb") as file:
+                for chunk in chunks:
+                    file.write(chunk)
+                    size += len(chunk)
+            meta: dict[str, Any] = {
+                "bucket": bucket,
+                "key": key,
+                "etag": etag,
+                "content_type": content_type,
+                "file_name": file_name,
+                "size": size,
+            }
+            tmp_meta.write_text(json.dumps(meta))
+            os.replace(tmp_data, data_path)
+            os.replace(tmp_meta, meta_path)
+        finally:
+            for path in (tmp_data, tmp_meta):
+                path.unlink(missing_ok=True)
+        self._evict(keep=data_path)
+        return S3CacheEntry(
+            path=data_path,
+            etag=etag,
+            content_type=content_type,
+            file_name=file_name,
+            size=size,
+        )
+
+    def _paths(self, bucket: str, key: str) -> tuple[Path, Path]:
+        digest = hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()
+        base = self._directory / digest[:2] / digest
+        base.parent.mkdir(exist_ok=True)
+        return (
+            base.with_name(digest + DATA_SUFFIX),
+            base.with_name(digest + META_SUFFIX),
+        )
+
+    def _evict(self, keep: Path) -> None:
+        entries = []
+        total = 0
+        for data_path in self._directory.glob(f"*/*{DATA_SUFFIX}"):
+            try:
+                stat = data_path.stat()
+            except OSError:
+                continue
+            total += stat.st_size
+            if data_path != keep:
+                entries.append((stat.st_mtime, stat.st_size, data_path))
+        if total <= self.config.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, data_path in entries:
+            if total <= self.config.max_bytes:
+                break
+            data_path.with_suffix(META_SUFFIX).unlink(missing_ok=True)
+            data_path.unlink(missing_ok=True)
+            total -= size
+            with self._lock:
+                self._stats.evictions += 1
+                self._stats.evicted_bytes += size
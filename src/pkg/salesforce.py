@@ -1,13 +1,40 @@
-import datetime
+import contextlib
+import csv
+import io
+import json
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
 from http import HTTPStatus
-from typing import Any, List, Optional, Protocol, Tuple
+from typing import Any, Iterable, Iterator, List, Optional, Protocol, Tuple, Union
 
 import requests
-from pydantic import BaseModel
+from pydantic import BaseModel, NonNegativeInt, PositiveFloat, PositiveInt
 from requests.adapters import HTTPAdapter, Retry
+from urllib3.connection import HTTPConnection
 
-from src.config.common import ExpRetryConfig
+from src.config.common import CircuitBreakerConfig, ExpRetryConfig, RateLimitConfig
 from src.pkg import logging
+from src.pkg.db import IHandler
+from src.pkg.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    JitteredRetry,
+    RateLimitTimeoutError,
+    TokenBucket,
+    full_jitter_backoff_ms,
+)
+from src.pkg.sf_token import (
+    AccessToken,
+    FileTokenStore,
+    ITokenStore,
+    PostgresTokenStore,
+    SfTokenCacheConfig,
+    SfTokenProvider,
+)
 
 
 class SalesforcePushError(Exception):
@@ -22,6 +49,28 @@ class SfData(BaseModel):
     data: List[dict[Any, Any]]
 
 
+class SfIngestOperation(str, Enum):
+    INSERT = "insert"
+    UPDATE = "update"
+    UPSERT = "upsert"
+    DELETE = "delete"
+    HARD_DELETE = "hardDelete"
+
+
+@dataclass
+class SfIngestJobResult:
+    job_id: str
+    state: str
+    records_processed: int = 0
+    records_failed: int = 0
+    failed_results: List[dict[str, str]] = field(default_factory=list)
+    error_message: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.state == "JobComplete" and self.records_failed == 0
+
+
 class SalesforceConfig(BaseModel):
     mock: bool = False
     instance_url: str
@@ -31,10 +80,28 @@ class SalesforceConfig(BaseModel):
     password: str
     auth_url: str
     timeout_sec: int = 20
+    connect_timeout_sec: PositiveFloat = 5
+    pool_size: PositiveInt = 10
+    keep_alive: bool = True
+    keep_alive_idle_sec: PositiveInt = 60
+    bulk_chunk_size: PositiveInt = 200
+    bulk_max_workers: PositiveInt = 4
+    bulk_chunk_retries: NonNegativeInt = 2
+    bulk_api_version: str = "v60.0"
+    bulk_ingest_max_bytes: PositiveInt = 100 * 1024 * 1024
+    bulk_poll_interval_sec: PositiveFloat = 5
+    bulk_poll_timeout_sec: PositiveInt = 3600
+    write_buffer_max_rows: PositiveInt = 500
+    write_buffer_max_bytes: PositiveInt = 1024 * 1024
+    write_buffer_linger_ms: NonNegativeInt = 200
+    write_buffer_row_key: Optional[str] = None
     auth_token_expiry_sec: int
     auth_token: Optional[str] = None
     auth_token_expiry: Optional[int] = None
+    token_cache: Optional[SfTokenCacheConfig] = None
     retry: Optional[ExpRetryConfig]
+    rate_limit: Optional[RateLimitConfig] = None
+    circuit_breaker: Optional[CircuitBreakerConfig] = None
     sf_sync_endpoint: Optional[str] = None
 
 
@@ -47,9 +114,105 @@ class ISFClient(Protocol):  # pragma: no cover
     ) -> dict[str, Any]:
         raise NotImplementedError
 
+    def ingest(
+        self,
+        sf_object: str,
+        data_list: Iterable[SfData],
+        operation: SfIngestOperation = SfIngestOperation.INSERT,
+        external_id_field: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[SfIngestJobResult]:
+        raise NotImplementedError
+
 
 logger = logging.get_logger()
 
+INGEST_FINAL_STATES = {"JobComplete", "Failed", "Aborted"}
+
+
+def _push_error_code(err: Exception) -> Optional[int]:
+    """Returns the HTTP status of a SalesforcePushError, if it carries one."""
+    if not isinstance(err, SalesforcePushError) or not err.args:
+        return None
+    detail = err.args[0]
+    code = detail.get("code") if isinstance(detail, dict) else None
+    return code if isinstance(code, int) else None
+
+
+def _is_transient(err: Exception) -> bool:
+    """Whether a failed push may succeed when it is sent again unchanged."""
+    if isinstance(
+        err,
+        (
+            CircuitOpenError,
+            RateLimitTimeoutError,
+            requests.ConnectionError,
+            requests.Timeout,
+        ),
+    ):
+        return True
+    code = _push_error_code(err)
+    return code is not None and (
+        code >= HTTPStatus.INTERNAL_SERVER_ERROR or code == HTTPStatus.TOO_MANY_REQUESTS
+    )
+
+
+class _CsvParts:
+    """
+    Renders records as CSV lazily, one upload of at most max_bytes at a time.
+    The record which does not fit into an upload anymore is carried over to
+    the next one.
+    """
+
+    def __init__(
+        self, records: Iterator[dict[Any, Any]], fields: List[str], max_bytes: int
+    ) -> None:
+        self._records = records
+        self._fields = fields
+        self._max_bytes = max_bytes
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._carry: Optional[bytes] = None
+        self.header = self._line(fields)
+
+    def exhausted(self) -> bool:
+        if self._carry is not None:
+            return False
+        record = next(self._records, None)
+        if record is None:
+            return True
+        self._carry = self._render(record)
+        return False
+
+    def part(self) -> Iterator[bytes]:
+        size = len(self.header)
+        yield self.header
+        while True:
+            line = self._carry
+            if line is None:
+                record = next(self._records, None)
+                if record is None:
+                    return
+                line = self._render(record)
+            # an upload holds at least one record, even an oversized one
+            if size + len(line) > self._max_bytes and size > len(self.header):
+                self._carry = line
+                return
+            self._carry = None
+            size += len(line)
+            yield line
+
+    def _render(self, record: dict[Any, Any]) -> bytes:
+        return self._line(
+            ["" if record.get(name) is None else record[name] for name in self._fields]
+        )
+
+    def _line(self, values: List[Any]) -> bytes:
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerow(values)
+        return self._buffer.getvalue().encode()
+
 
 class MockSfClient:  # pragma: no cover
     def push_data(
@@ -68,19 +231,123 @@ class MockSfClient:  # pragma: no cover
         )
         return {"failed_rows": [], "success_rows": []}
 
+    def ingest(
+        self,
+        sf_object: str,
+        data_list: Iterable[SfData],
+        operation: SfIngestOperation = SfIngestOperation.INSERT,
+        external_id_field: Optional[str] = None,  # pylint: disable=unused-argument
+        fields: Optional[List[str]] = None,  # pylint: disable=unused-argument
+    ) -> List[SfIngestJobResult]:
+        logger.info("MOCKING_SF_INGEST")
+        records = sum(len(data.data) for data in data_list)
+        logger.debug(
+            "MOCK_SF_INGEST_DATA",
+            sf_object=sf_object,
+            operation=operation,
+            records=records,
+        )
+        return [
+            SfIngestJobResult(
+                job_id="mock", state="JobComplete", records_processed=records
+            )
+        ]
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections enable TCP keep-alive probes."""
+
+    def __init__(self, keep_alive_idle_sec: Optional[int] = None, **kwargs: Any):
+        self._socket_options = list(HTTPConnection.default_socket_options)
+        if keep_alive_idle_sec is not None:
+            self._socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                self._socket_options.append(
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keep_alive_idle_sec)
+                )
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        kwargs["socket_options"] = self._socket_options
+        super().init_poolmanager(*args, **kwargs)
+
 
 class SFClient:
-    def __init__(self, config: SalesforceConfig) -> None:
+    def __init__(
+        self, config: SalesforceConfig, db_handler: Optional[IHandler] = None
+    ) -> None:
         self.config = config
         self.retry: Optional[Retry] = None
         if config.retry:
-            self.retry = Retry(
+            self.retry = JitteredRetry(
+                backoff_config=config.retry,
                 total=config.retry.max_retries,
-                backoff_factor=config.retry.exponent,
             )
+        self.rate_limiter: Optional[TokenBucket] = None
+        if config.rate_limit:
+            self.rate_limiter = TokenBucket(config.rate_limit)
+        self.circuit_breaker: Optional[CircuitBreaker] = None
+        if config.circuit_breaker:
+            self.circuit_breaker = CircuitBreaker(config.circuit_breaker)
         self.common_headers: dict[str, str] = {
             "Content-Type": "application/json",
         }
+        self.timeout = (config.connect_timeout_sec, config.timeout_sec)
+        # one session per client so that connections to the instance are
+        # reused, the urllib3 pool behind it is safe to share between threads
+        self.session = self._build_session(self.retry or 0)
+        # the CSV of an ingest upload is generated while it is sent and cannot
+        # be replayed, a retry would send an empty body
+        self.upload_session = self._build_session(0)
+        self.token_provider = self._build_token_provider(db_handler)
+
+    def _build_session(self, max_retries: Union[Retry, int]) -> requests.Session:
+        session = requests.Session()
+        adapter = KeepAliveAdapter(
+            keep_alive_idle_sec=(
+                self.config.keep_alive_idle_sec if self.config.keep_alive else None
+            ),
+            pool_connections=1,
+            pool_maxsize=self.config.pool_size,
+            pool_block=True,
+            max_retries=max_retries,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _build_token_provider(self, db_handler: Optional[IHandler]) -> SfTokenProvider:
+        cache = self.config.token_cache
+        store: Optional[ITokenStore] = None
+        if cache is not None and cache.file_path:
+            store = FileTokenStore(cache.file_path)
+        elif cache is not None and cache.use_db:
+            if db_handler is None:
+                raise ValueError("token_cache.use_db requires a database handler")
+            store = PostgresTokenStore(
+                db_handler, key=f"{self.config.instance_url}|{self.config.username}"
+            )
+        token = None
+        if self.config.auth_token and self.config.auth_token_expiry:
+            token = AccessToken(
+                token=self.config.auth_token, expires_at=self.config.auth_token_expiry
+            )
+        return SfTokenProvider(
+            fetch=self._fetch_access_token,
+            refresh_before_sec=cache.refresh_before_sec if cache else 300,
+            store=store,
+            token=token,
+        )
+
+    def close(self) -> None:
+        self.session.close()
+        self.upload_session.close()
+
+    def __enter__(self) -> "SFClient":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
 
     def push_data(
         self,
@@ -89,20 +356,20 @@ class SFClient:
             raw_data: Optional[dict[Any, Any]] = None,
     ) -> dict[str, Any]:
 
-        with requests.Session() as session:
-            session.mount("https://", HTTPAdapter(max_retries=self.retry))
-            url = f"{self.config.instance_url}{sf_endpoint}"
-            access_token = self.get_access_token(session)
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-            }
-            headers.update(self.common_headers)
-            if not raw_data:
-                raw_data = []
-                for data in data_list:
-                    raw_data.append(data.model_dump())
-            response = session.post(url, json=raw_data, headers=headers)
+        url = f"{self.config.instance_url}{sf_endpoint}"
+        access_token = self.get_access_token()
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+        }
+        headers.update(self.common_headers)
+        if not raw_data:
+            raw_data = []
+            for data in data_list:
+                raw_data.append(data.model_dump())
+        response = self._request("POST", url, json=raw_data, headers=headers)
 
+        if response.status_code == HTTPStatus.UNAUTHORIZED:
+            self.token_provider.invalidate()
         if response.status_code != HTTPStatus.OK:
             raise SalesforcePushError(
                 {
@@ -118,14 +385,294 @@ class SFClient:
 
         return response_data
 
-    def get_access_token(self, session: requests.Session) -> Tuple[str, str]:
+    def push_data_bulk(
+        self,
+        sf_endpoint: str,
+        data_list: List[SfData],
+        chunk_size: Optional[int] = None,
+    ) -> dict[str, Any]:
+        """
+        Pushes data_list in chunks of bulk_chunk_size entries, concurrently on
+        at most bulk_max_workers connections, and merges the failed_rows and
+        success_rows of every chunk. A chunk whose request fails with a server
+        error, a 429 or a transport error is retried on its own up to
+        bulk_chunk_retries times, a chunk rejected with a 401 is retried once
+        with a fresh token. Chunks which still fail, or fail with an error that
+        sending them again cannot fix, are reported under failed_chunks with
+        their rows and the last error, the other chunks are not sent again.
+
+        :param sf_endpoint: Endpoint, relative to the instance URL
+        :param data_list: Data to push
+        :param chunk_size: Entries per request, bulk_chunk_size if None
+        :return: The merged failed_rows, success_rows and failed_chunks
+        """
+        size = chunk_size or self.config.bulk_chunk_size
+        chunks = [data_list[i : i + size] for i in range(0, len(data_list), size)]
+        pending = list(range(len(chunks)))
+        result: dict[str, Any] = {
+            "failed_rows": [],
+            "success_rows": [],
+            "failed_chunks": [],
+        }
+        errors: dict[int, Exception] = {}
+        reauthorized: set[int] = set()
+        given_up: List[int] = []
+
+        def push(idx: int) -> Tuple[Optional[dict[str, Any]], Any]:
+            try:
+                response = self.push_data(
+                    sf_endpoint, raw_data=[data.model_dump() for data in chunks[idx]]
+                )
+            except (
+                SalesforcePushError,
+                SalesforceAuthError,
+                CircuitOpenError,
+                RateLimitTimeoutError,
+                requests.RequestException,
+            ) as err:
+                return None, err
+            return response, None
+
+        def retryable(idx: int, err: Exception) -> bool:
+            if _push_error_code(err) == HTTPStatus.UNAUTHORIZED:
+                # push_data invalidated the token, the retry fetches a new one
+                if idx in reauthorized:
+                    return False
+                reauthorized.add(idx)
+                return True
+            return _is_transient(err)
+
+        workers = min(self.config.bulk_max_workers, self.config.pool_size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for attempt in range(self.config.bulk_chunk_retries + 1):
+                if not pending:
+                    break
+                if attempt and self.config.retry:
+                    time.sleep(full_jitter_backoff_ms(self.config.retry, attempt) / 1000)
+                failed = []
+                for idx, (response, err) in zip(pending, executor.map(push, pending)):
+                    if response is None:
+                        errors[idx] = err
+                        failed.append(idx)
+                        continue
+                    result["failed_rows"].extend(response.get("failed_rows") or [])
+                    result["success_rows"].extend(response.get("success_rows") or [])
+                pending = [idx for idx in failed if retryable(idx, errors[idx])]
+                if failed:
+                    logger.warning(
+                        "SF_BULK_PUSH_CHUNKS_FAILED",
+                        context={
+                            "sf_endpoint": sf_endpoint,
+                            "attempt": attempt + 1,
+                            "failed_chunks": len(failed),
+                            "retryable_chunks": len(pending),
+                            "chunks": len(chunks),
+                        },
+                    )
+                given_up.extend(idx for idx in failed if idx not in pending)
+
+        for idx in sorted(given_up + pending):
+            result["failed_chunks"].append(
+                {
+                    "rows": [data.model_dump() for data in chunks[idx]],
+                    "error": repr(errors[idx]),
+                }
+            )
+        return result
+
+    def ingest(
+        self,
+        sf_object: str,
+        data_list: Iterable[SfData],
+        operation: SfIngestOperation = SfIngestOperation.INSERT,
+        external_id_field: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[SfIngestJobResult]:
+        """
+        Loads records through the Bulk API 2.0. The records are rendered as
+        CSV while they are uploaded, so data_list may be a generator and is
+        never held in memory as a whole. Once an upload reaches
+        bulk_ingest_max_bytes the job is closed and the remaining records go
+        to a new job.
+
+        :param sf_object: Object to load, e.g. Account
+        :param data_list: Data whose records are loaded
+        :param operation: Bulk operation of the jobs
+        :param external_id_field: External ID field, required for upserts
+        :param fields: CSV columns, the keys of the first record if None
+        :return: One result per job, with the failed records of each job
+        """
+        records = (record for data in data_list for record in data.data)
+        if fields is None:
+            first = next(records, None)
+            if first is None:
+                return []
+            fields = list(first.keys())
+            records = self._prepend(first, records)
+        parts = _CsvParts(records, fields, self.config.bulk_ingest_max_bytes)
+
+        job_ids = []
+        while not parts.exhausted():
+            job_id = self._create_ingest_job(sf_object, operation, external_id_field)
+            job_ids.append(job_id)
+            try:
+                self._bulk_request(
+                    "PUT",
+                    f"/jobs/ingest/{job_id}/batches",
+                    data=parts.part(),
+                    headers={"Content-Type": "text/csv"},
+                    session=self.upload_session,
+                )
+            except Exception:
+                # the failed upload is what the caller must see, not the abort
+                with contextlib.suppress(SalesforcePushError, requests.RequestException):
+                    self._bulk_request(
+                        "PATCH", f"/jobs/ingest/{job_id}", json={"state": "Aborted"}
+                    )
+                raise
+            self._bulk_request(
+                "PATCH", f"/jobs/ingest/{job_id}", json={"state": "UploadComplete"}
+            )
+            logger.info(
+                "SF_INGEST_JOB_UPLOADED",
+                context={"job_id": job_id, "sf_object": sf_object},
+            )
+        return [self._wait_for_ingest_job(job_id) for job_id in job_ids]
+
+    @staticmethod
+    def _prepend(
+        first: dict[Any, Any], rest: Iterator[dict[Any, Any]]
+    ) -> Iterator[dict[Any, Any]]:
+        yield first
+        yield from rest
+
+    def _create_ingest_job(
+        self,
+        sf_object: str,
+        operation: SfIngestOperation,
+        external_id_field: Optional[str],
+    ) -> str:
+        payload = {
+            "object": sf_object,
+            "operation": SfIngestOperation(operation).value,
+            "contentType": "CSV",
+            "lineEnding": "LF",
+        }
+        if external_id_field:
+            payload["externalIdFieldName"] = external_id_field
+        return self._bulk_request("POST", "/jobs/ingest", json=payload).json()["id"]
+
+    def _wait_for_ingest_job(self, job_id: str) -> SfIngestJobResult:
+        deadline = time.monotonic() + self.config.bulk_poll_timeout_sec
+        while True:
+            job = self._bulk_request("GET", f"/jobs/ingest/{job_id}").json()
+            if job["state"] in INGEST_FINAL_STATES:
+                break
+            if time.monotonic() >= deadline:
+                return SfIngestJobResult(
+                    job_id=job_id,
+                    state=job["state"],
+                    error_message="timed out waiting for the job",
+                )
+            time.sleep(self.config.bulk_poll_interval_sec)
+
+        result = SfIngestJobResult(
+            job_id=job_id,
+            state=job["state"],
+            records_processed=job.get("numberRecordsProcessed", 0),
+            records_failed=job.get("numberRecordsFailed", 0),
+            error_message=job.get("errorMessage"),
+        )
+        if result.records_failed:
+            response = self._bulk_request(
+                "GET", f"/jobs/ingest/{job_id}/failedResults/"
+            )
+            result.failed_results = list(csv.DictReader(io.StringIO(response.text)))
+        logger.info(
+            "SF_INGEST_JOB_FINISHED",
+            context={
+                "job_id": job_id,
+                "state": result.state,
+                "records_processed": result.records_processed,
+                "records_failed": result.records_failed,
+            },
+        )
+        return result
+
+    def _bulk_request(
+        self,
+        method: str,
+        path: str,
+        headers: Optional[dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        url = (
+            f"{self.config.instance_url}/services/data/"
+            f"{self.config.bulk_api_version}{path}"
+        )
+        request_headers = {"Authorization": f"Bearer {self.get_access_token()}"}
+        request_headers.update(headers or self.common_headers)
+        response = self._request(method, url, headers=request_headers, **kwargs)
+        if response.status_code == HTTPStatus.UNAUTHORIZED:
+            self.token_provider.invalidate()
+        if response.status_code >= HTTPStatus.BAD_REQUEST:
+            raise SalesforcePushError(
+                {
+                    "code": response.status_code,
+                    "content": response.content,
+                }
+            )
+        return response
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        session: Optional[requests.Session] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        Sends a request once the circuit breaker allows it and the rate limiter
+        granted a token. While the circuit is open calls fail fast with
+        CircuitOpenError, without taking a token and instead of holding the
+        calling thread in timeouts and retries. Server errors and 429s count as
+        failures.
+
+        :param session: Session to send the request with, self.session if None
+        """
+        session = session or self.session
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call()
+        if self.rate_limiter is not None:
+            assert self.config.rate_limit is not None
+            try:
+                self.rate_limiter.acquire(timeout=self.config.rate_limit.max_wait_sec)
+            except RateLimitTimeoutError:
+                # the call was never sent, a half-open probe must not stay taken
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.release()
+                raise
+        if self.circuit_breaker is None:
+            return session.request(method, url, timeout=self.timeout, **kwargs)
+
+        try:
+            response = session.request(method, url, timeout=self.timeout, **kwargs)
+        except Exception:
+            self.circuit_breaker.on_failure()
+            raise
         if (
-                self.config.auth_token
-                and self.config.auth_token_expiry
-                > (datetime.datetime.now() + datetime.timedelta(minutes=5)).timestamp()
+            response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or response.status_code == HTTPStatus.TOO_MANY_REQUESTS
         ):
-            return self.config.auth_token
+            self.circuit_breaker.on_failure()
+        else:
+            self.circuit_breaker.on_success()
+        return response
 
+    def get_access_token(self) -> str:
+        return self.token_provider.get()
+
+    def _fetch_access_token(self) -> AccessToken:
         auth_url = f"{self.config.instance_url}{self.config.auth_url}"
         payload = {
             "grant_type": "password",
@@ -135,7 +682,7 @@ class SFClient:
             "password": f"{self.config.password}",
         }
 
-        response = session.post(auth_url, data=payload, timeout=self.config.timeout_sec)
+        response = self._request("POST", auth_url, data=payload)
 
         if response.status_code != HTTPStatus.OK:
             raise SalesforceAuthError
@@ -143,10 +690,150 @@ class SFClient:
         auth_response = response.json()
         if auth_response.get("access_token", None) is None:
             raise SalesforceAuthError
-        auth_token = auth_response.get("access_token")
-        self.config.auth_token = auth_token
-        self.config.auth_token_expiry = (
-                datetime.datetime.now().timestamp() + self.config.auth_token_expiry_sec
+        logger.info("SF_ACCESS_TOKEN_REFRESHED")
+        return AccessToken(
+            token=auth_response.get("access_token"),
+            expires_at=time.time() + self.config.auth_token_expiry_sec,
         )
 
-        return auth_response.get("access_token")
+
+_PendingPush = tuple[List[SfData], int, int, Future]
+
+
+class SfWriteBuffer:
+    """
+    Coalesces pushes to the same endpoint into one request. Data is buffered
+    per sf_endpoint and pushed from a background thread once the buffered
+    rows reach write_buffer_max_rows, their size reaches
+    write_buffer_max_bytes, or the oldest of them waited for
+    write_buffer_linger_ms.
+
+    Callers get a future resolved with the outcome of their own rows. With
+    write_buffer_row_key set the failed_rows and success_rows of the response
+    are matched to callers by that field of the rows; rows which cannot be
+    matched, and every row when no key is configured, are reported to all
+    callers of the push.
+    """
+
+    def __init__(self, client: ISFClient, config: SalesforceConfig) -> None:
+        self._client = client
+        self._max_rows = config.write_buffer_max_rows
+        self._max_bytes = config.write_buffer_max_bytes
+        self._linger_sec = config.write_buffer_linger_ms / 1000
+        self._row_key = config.write_buffer_row_key
+        self._buffers: dict[str, List[_PendingPush]] = {}
+        self._deadlines: dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="sf-write-buffer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self, sf_endpoint: str, data_list: List[SfData]
+    ) -> "Future[dict[str, Any]]":
+        rows = sum(len(data.data) for data in data_list)
+        size = len(json.dumps([data.model_dump() for data in data_list], default=str))
+        future: Future[dict[str, Any]] = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SfWriteBuffer is closed")
+            buffer = self._buffers.setdefault(sf_endpoint, [])
+            if not buffer:
+                self._deadlines[sf_endpoint] = time.monotonic() + self._linger_sec
+            buffer.append((data_list, rows, size, future))
+            self._cond.notify()
+        return future
+
+    def close(self) -> None:
+        """Pushes everything buffered and stops the flusher thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                ready = self._take_ready()
+                while not ready and not (self._closed and not self._buffers):
+                    timeout = None
+                    if self._deadlines:
+                        next_deadline = min(self._deadlines.values())
+                        timeout = max(next_deadline - time.monotonic(), 0)
+                    self._cond.wait(timeout)
+                    ready = self._take_ready()
+            if not ready:
+                return
+            for sf_endpoint, batch in ready:
+                self._flush(sf_endpoint, batch)
+
+    def _take_ready(self) -> List[Tuple[str, List[_PendingPush]]]:
+        now = time.monotonic()
+        ready = []
+        for sf_endpoint in list(self._buffers):
+            buffer = self._buffers[sf_endpoint]
+            rows = sum(item[1] for item in buffer)
+            size = sum(item[2] for item in buffer)
+            if not (
+                self._closed
+                or rows >= self._max_rows
+                or size >= self._max_bytes
+                or self._deadlines[sf_endpoint] <= now
+            ):
+                continue
+            del self._buffers[sf_endpoint]
+            del self._deadlines[sf_endpoint]
+            # split into pushes within the limits, each holding at least one caller
+            batch: List[_PendingPush] = []
+            rows = size = 0
+            for item in buffer:
+                if batch and (
+                    rows + item[1] > self._max_rows or size + item[2] > self._max_bytes
+                ):
+                    ready.append((sf_endpoint, batch))
+                    batch, rows, size = [], 0, 0
+                batch.append(item)
+                rows += item[1]
+                size += item[2]
+            ready.append((sf_endpoint, batch))
+        return ready
+
+    def _flush(self, sf_endpoint: str, batch: List[_PendingPush]) -> None:
+        try:
+            response = self._client.push_data(
+                sf_endpoint,
+                data_list=[data for data_list, *_ in batch for data in data_list],
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        if self._row_key is None or len(batch) == 1:
+            for *_, future in batch:
+                future.set_result(response)
+            return
+
+        owners: dict[Any, int] = {}
+        for index, (data_list, *_) in enumerate(batch):
+            for data in data_list:
+                for row in data.data:
+                    owners[row.get(self._row_key)] = index
+        results: List[dict[str, Any]] = [
+            {"failed_rows": [], "success_rows": []} for _ in batch
+        ]
+        for name in ("failed_rows", "success_rows"):
+            for row in response.get(name) or []:
+                owner = (
+                    owners.get(row.get(self._row_key))
+                    if isinstance(row, dict)
+                    else None
+                )
+                targets = results if owner is None else [results[owner]]
+                for result in targets:
+                    result[name].append(row)
+        for (*_, future), result in zip(batch, results):
+            future.set_result(result)
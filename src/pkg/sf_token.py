@@ -0,0 +1,276 @@
+"""
+This module provides the access token provider of the Salesforce client.
+
+The provider hands out a cached token and refreshes it at most once at a
+time: concurrent callers wait for the refresh in flight instead of starting
+their own. A token close to its expiry is refreshed in the background while
+callers keep using it. With a shared store the token is also reused by all
+processes of a host (file) or of a deployment (Postgres), which refresh under
+a lock held across processes.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Protocol
+
+from pydantic import BaseModel, PositiveInt
+from sqlalchemy import BigInteger, Column, Text, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.pkg import logging, utils
+from src.pkg.db import BaseModel as DbBaseModel
+from src.pkg.db import IHandler
+
+logger = logging.get_logger()
+
+# a token expiring sooner than this is not handed out anymore
+MIN_TOKEN_TTL_SEC = 30
+
+
+class SfTokenCacheConfig(BaseModel):
+    file_path: Optional[str] = None
+    use_db: bool = False
+    refresh_before_sec: PositiveInt = 300
+
+
+class SalesforceToken(DbBaseModel):
+    __tablename__ = "salesforce_tokens"
+
+    token = Column(Text, nullable=False)
+    expires_at = Column(BigInteger, nullable=False)
+
+
+@dataclass
+class AccessToken:
+    token: str
+    expires_at: float
+
+    def valid_until(self, timestamp: float) -> bool:
+        return self.expires_at > timestamp
+
+
+class ITokenStore(Protocol):  # pragma: no cover
+    def load(self) -> Optional[AccessToken]:
+        raise NotImplementedError
+
+    def refresh(
+        self,
+        fetch: Callable[[], AccessToken],
+        min_valid_until: float,
+        rejected: Optional[str] = None,
+    ) -> AccessToken:
+        """
+        Returns the stored token if it is valid until min_valid_until and is
+        not the rejected one, otherwise stores a new one from fetch. Holds a
+        lock shared with other processes so that only one of them fetches.
+        """
+        raise NotImplementedError
+
+
+class FileTokenStore:
+    def __init__(self, file_path: str) -> None:
+        self._path = Path(file_path)
+        self._lock_path = self._path.with_name(self._path.name + ".lock")
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+    def load(self) -> Optional[AccessToken]:
+        try:
+            data = json.loads(self._path.read_text())
+            return AccessToken(token=data["token"], expires_at=data["expires_at"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def refresh(
+        self,
+        fetch: Callable[[], AccessToken],
+        min_valid_until: float,
+        rejected: Optional[str] = None,
+    ) -> AccessToken:
+        with open(self._lock_path, "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                token = self.load()
+                if (
+                    token is not None
+                    and token.valid_until(min_valid_until)
+                    and token.token != rejected
+                ):
+                    return token
+                token = fetch()
+                self._save(token)
+                return token
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _save(self, token: AccessToken) -> None:
+        tmp_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+        # the token is a credential, it is only readable by the worker user
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump({"token": token.token, "expires_at": token.expires_at}, file)
+        os.replace(tmp_path, self._path)
+
+
+class PostgresTokenStore:
+    def __init__(self, db_handler: IHandler, key: str) -> None:
+        self._db = db_handler
+        self._key = key
+        # advisory locks are keyed by a bigint
+        self._lock_id = int.from_bytes(
+            hashlib.sha256(key.encode()).digest()[:8], "big", signed=True
+        )
+
+    def load(self) -> Optional[AccessToken]:
+        with self._db.get_session() as session:
+            row = session.execute(
+                select(SalesforceToken.token, SalesforceToken.expires_at).where(
+                    SalesforceToken.id == self._key
+                )
+            ).first()
+        if row is None:
+            return None
+        return AccessToken(token=row.token, expires_at=row.expires_at / 1000)
+
+    def refresh(
+        self,
+        fetch: Callable[[], AccessToken],
+        min_valid_until: float,
+        rejected: Optional[str] = None,
+    ) -> AccessToken:
+        with self._db.get_session() as session:
+            # released with the transaction, also when the fetch fails
+            session.execute(
+                select(func.pg_advisory_xact_lock(literal(self._lock_id, BigInteger)))
+            )
+            row = session.execute(
+                select(SalesforceToken.token, SalesforceToken.expires_at).where(
+                    SalesforceToken.id == self._key
+                )
+            ).first()
+            if (
+                row is not None
+                and row.expires_at / 1000 > min_valid_until
+                and row.token != rejected
+            ):
+                session.rollback()
+                return AccessToken(token=row.token, expires_at=row.expires_at / 1000)
+
+            token = fetch()
+            now = utils.time_ms()
+            expires_at = int(token.expires_at * 1000)
+            stmt = insert(SalesforceToken).values(
+                id=self._key,
+                created_at=now,
+                updated_at=now,
+                token=token.token,
+                expires_at=expires_at,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SalesforceToken.id],
+                set_={
+                    "updated_at": now,
+                    "token": token.token,
+                    "expires_at": expires_at,
+                },
+            )
+            session.execute(stmt)
+            session.commit()
+        return token
+
+
+class SfTokenProvider:
+    def __init__(
+        self,
+        fetch: Callable[[], AccessToken],
+        refresh_before_sec: int = 300,
+        store: Optional[ITokenStore] = None,
+        token: Optional[AccessToken] = None,
+    ) -> None:
+        self._fetch = fetch
+        self._refresh_before_sec = refresh_before_sec
+        self._store = store
+        self._token = token
+        # held for the whole refresh, including the HTTP call
+        self._lock = threading.Lock()
+        # only guards starting the background refresh, so that callers still
+        # holding a valid token never wait for a refresh in progress
+        self._background_lock = threading.Lock()
+        self._background: Optional[threading.Thread] = None
+        self._refreshed_at = 0.0
+        self._rejected: Optional[str] = None
+
+    def get(self) -> str:
+        """
+        Returns a valid token. A token expiring within refresh_before_sec is
+        still returned while a background refresh replaces it, callers only
+        wait when there is no token that lives for MIN_TOKEN_TTL_SEC anymore.
+        """
+        now = time.time()
+        token = self._token
+        if token is not None and token.valid_until(now + self._refresh_before_sec):
+            return token.token
+        if token is not None and token.valid_until(now + MIN_TOKEN_TTL_SEC):
+            self._refresh_in_background()
+            return token.token
+        return self._refresh_now().token
+
+    def invalidate(self) -> None:
+        """Drops the cached token, e.g. after Salesforce rejected it."""
+        with self._lock:
+            if self._token is not None:
+                self._rejected = self._token.token
+            self._token = None
+
+    def _refresh_now(self) -> AccessToken:
+        with self._lock:
+            # the refresh of another caller may have finished while waiting
+            token = self._token
+            if token is not None and token.valid_until(time.time() + MIN_TOKEN_TTL_SEC):
+                return token
+            return self._refresh(time.time() + MIN_TOKEN_TTL_SEC)
+
+    def _refresh_in_background(self) -> None:
+        with self._background_lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            # tokens issued for less than refresh_before_sec must not make
+            # every call refresh again
+            if time.time() - self._refreshed_at < MIN_TOKEN_TTL_SEC:
+                return
+            self._background = threading.Thread(
+                target=self._background_refresh,
+                name="sf-token-refresh",
+                daemon=True,
+            )
+            self._background.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            with self._lock:
+                self._refresh(time.time() + self._refresh_before_sec)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # callers fall back to a blocking refresh once the token runs out
+            logger.exception("SF_TOKEN_REFRESH_FAILED")
+
+    def _refresh(self, min_valid_until: float) -> AccessToken:
+        if self._store is None:
+            token = self._fetch()
+        else:
+            token = self._store.load()
+            if (
+                token is None
+                or not token.valid_until(min_valid_until)
+                or token.token == self._rejected
+            ):
+                token = self._store.refresh(
+                    self._fetch, min_valid_until, rejected=self._rejected
+                )
+        self._token = token
+        self._refreshed_at = time.time()
+        return token
@@ -1,12 +1,69 @@
+import asyncio
+import gzip
+import hashlib
 import json
+import queue
+import string
+import threading
+import time
 import uuid
-from typing import Optional
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, List, Optional
 
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import BotoCoreError, ClientError
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, NonNegativeInt, PositiveInt, model_validator
 
 from src.pkg import logging
+from src.pkg.s3 import S3Client
+
+
+class SqsConsumerMode(str, Enum):
+    LISTENER = "listener"
+    THREAD = "thread"
+    ASYNCIO = "asyncio"
+
+
+class SqsGroupStrategy(str, Enum):
+    FIXED = "fixed"
+    FIELD = "field"
+    HASH = "hash"
+
+
+class SqsMessageGroupConfig(BaseModel):
+    strategy: SqsGroupStrategy = SqsGroupStrategy.FIXED
+    group_id: str = "LMS-MESSAGE-GROUP"
+    field: Optional[str] = None
+    shards: PositiveInt = 16
+    content_based_deduplication: bool = False
+
+
+class SqsClaimCheckConfig(BaseModel):
+    bucket: str
+    prefix: str = "claim-check/"
+    threshold_bytes: PositiveInt = 200 * 1024
+    compress: bool = True
+    cache_size: PositiveInt = 64
+
+
+class SqsDedupeConfig(BaseModel):
+    key_field: Optional[str] = None
+    ttl_sec: PositiveInt = 86400
+    max_entries: PositiveInt = 100000
+    use_db: bool = False
+
+
+class SqsQuarantineConfig(BaseModel):
+    max_attempts: PositiveInt = 5
+    bucket: Optional[str] = None
+    prefix: str = "quarantine/"
+    dlq_url: Optional[str] = None
 
 
 class AwsSQSConfig(BaseModel):
@@ -16,40 +73,132 @@ class AwsSQSConfig(BaseModel):
     poll_interval_sec: int = 10
     wait_time_sec: int = 20
     endpoint: Optional[str] = None
+    consumer_mode: SqsConsumerMode = SqsConsumerMode.LISTENER
+    max_in_flight: PositiveInt = 10
+    prefetch_size: PositiveInt = 10
+    min_poll_interval_ms: PositiveInt = 100
+    stats_interval_sec: PositiveInt = 60
+    ack_batch_size: int = Field(default=10, ge=1, le=10)
+    ack_flush_interval_ms: PositiveInt = 1000
+    visibility_timeout_sec: Optional[PositiveInt] = None
+    heartbeat_interval_sec: PositiveInt = 10
+    batch_mode: bool = False
+    batch_window_ms: NonNegativeInt = 0
+    prefork: bool = False
+    processes: Optional[PositiveInt] = None
+    drain_timeout_sec: PositiveInt = 60
+    dedupe: Optional[SqsDedupeConfig] = None
+    quarantine: Optional[SqsQuarantineConfig] = None
+    send_batch_linger_ms: NonNegativeInt = 50
+    message_group: SqsMessageGroupConfig = SqsMessageGroupConfig()
+    claim_check: Optional[SqsClaimCheckConfig] = None
+    send_pool_size: PositiveInt = 10
+
+    @model_validator(mode="after")
+    def check_consumer_mode(self) -> "AwsSQSConfig":
+        if self.consumer_mode != SqsConsumerMode.LISTENER:
+            return self
+        # only the pooled consumer implements these, the listener would
+        # silently ignore them. It also cannot stop between messages, so a
+        # forwarded SIGTERM would kill a forked child in the middle of one.
+        pooled_only = {
+            "prefork": self.prefork,
+            "dedupe": self.dedupe is not None,
+            "quarantine": self.quarantine is not None,
+            "visibility_timeout_sec": self.visibility_timeout_sec is not None,
+            "batch_mode": self.batch_mode,
+        }
+        options = [name for name, enabled in pooled_only.items() if enabled]
+        if options:
+            raise ValueError(
+                f"{', '.join(options)} requires consumer_mode thread or asyncio"
+            )
+        return self
+
+    @model_validator(mode="after")
+    def check_heartbeat_interval(self) -> "AwsSQSConfig":
+        # a message must be extended before its visibility timeout runs out
+        if (
+            self.visibility_timeout_sec is not None
+            and self.heartbeat_interval_sec >= self.visibility_timeout_sec
+        ):
+            raise ValueError(
+                "heartbeat_interval_sec must be below visibility_timeout_sec"
+            )
+        return self
+
+
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 256 * 1024
+CLAIM_CHECK_KEY = "__claim_check__"
+MAX_GROUP_ID_LENGTH = 128
+# SQS accepts alphanumerics and punctuation in message group ids
+GROUP_ID_CHARS = frozenset(string.ascii_letters + string.digits + string.punctuation)
+
+
+@dataclass
+class SQSSendResult:
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
 
 
 logger = logging.get_logger()
 
 
+def field_value(body: Any, field: Optional[str]) -> Any:
+    """Returns the value at a dotted field path of a body, None if it is missing."""
+    if not field:
+        return None
+    value = body
+    for part in field.split("."):
+        if not part:
+            continue
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
 class SQSMessageSender:
-    def __init__(self, config: AwsSQSConfig):
+    def __init__(self, config: AwsSQSConfig, s3_client: Optional[S3Client] = None):
         """
         Initializes the SQSMessageSender with the given configuration.
 
         :param config: AwsSQSConfig object containing queue configuration.
+        :param s3_client: S3Client used to offload large bodies, required when
+            claim_check is configured.
         """
+        if config.claim_check is not None and s3_client is None:
+            raise ValueError("claim_check requires an S3 client")
         self.config = config
+        self.s3_client = s3_client
         self.sqs_client = boto3.client(
             "sqs",
             region_name=self.config.region,
             endpoint_url=self.config.endpoint,
+            config=BotoConfig(max_pool_connections=self.config.send_pool_size),
         )
 
-    def send_message(self, message_body: dict, message_attributes: dict = None) -> dict:
+    def send_message(
+        self,
+        message_body: dict,
+        message_attributes: dict = None,
+        group_key: Optional[str] = None,
+    ) -> dict:
         """
         Sends a message to the SQS queue.
 
         :param message_body: The body of the message as a dictionary.
         :param message_attributes: Optional attributes for the message.
+        :param group_key: Optional message group, overrides the configured strategy.
         :return: The response from the SQS service.
         """
         try:
             response = self.sqs_client.send_message(
                 QueueUrl=self.config.queue_url,
-                MessageBody=json.dumps(message_body),
-                MessageAttributes=self._format_message_attributes(message_attributes),
-                MessageGroupId="LMS-MESSAGE-GROUP",
-                MessageDeduplicationId=str(uuid.uuid4()),
+                **self._build_entry(message_body, message_attributes, group_key),
             )
             logger.info(
                 "SQS_MESSAGE_TRIGGER_SUCCESS",
@@ -59,7 +208,7 @@ class SQSMessageSender:
                 },
             )
             return response
-        except (BotoCoreError, ClientError) as e:
+        except (BotoCoreError, ClientError, S3UploadFailedError) as e:
             logger.info(
                 "SQS_MESSAGE_TRIGGER_FAILED",
                 context={
@@ -69,6 +218,183 @@ class SQSMessageSender:
             )
             raise RuntimeError(f"Failed to send message to SQS: {e}")
 
+    def send_messages(
+        self,
+        message_bodies: List[dict],
+        message_attributes: Optional[List[Optional[dict]]] = None,
+        group_keys: Optional[List[Optional[str]]] = None,
+    ) -> List[SQSSendResult]:
+        """
+        Sends messages to the SQS queue using as few SendMessageBatch calls as
+        the 10 entries and 256KB per batch limits allow. Failures are reported
+        per message instead of being raised.
+
+        :param message_bodies: The bodies of the messages as dictionaries.
+        :param message_attributes: Optional attributes, one entry per message.
+        :param group_keys: Optional message groups, one entry per message.
+        :return: One result per message, in the order of message_bodies.
+        :raises ValueError: If message_attributes or group_keys do not have
+            one entry per message.
+        """
+        attributes = message_attributes or [None] * len(message_bodies)
+        groups = group_keys or [None] * len(message_bodies)
+        if len(attributes) != len(message_bodies) or len(groups) != len(
+            message_bodies
+        ):
+            raise ValueError(
+                "message_attributes and group_keys need one entry per message"
+            )
+        results = [SQSSendResult() for _ in message_bodies]
+        batch: List[tuple[int, dict]] = []
+        batch_bytes = 0
+        for idx, (body, attrs, group_key) in enumerate(
+            zip(message_bodies, attributes, groups)
+        ):
+            try:
+                entry = self._build_entry(body, attrs, group_key)
+            except (BotoCoreError, ClientError, S3UploadFailedError) as e:
+                # the claim check upload failed, only this message is lost
+                logger.info(
+                    "SQS_CLAIM_CHECK_UPLOAD_FAILED",
+                    context={"index": idx, "error": str(e)},
+                )
+                results[idx].error = f"Failed to store the message body in S3: {e}"
+                continue
+            size = self._entry_size(entry)
+            if size > MAX_BATCH_BYTES:
+                results[idx].error = f"message of {size} bytes exceeds the SQS limit"
+                continue
+            if len(batch) == MAX_BATCH_ENTRIES or batch_bytes + size > MAX_BATCH_BYTES:
+                self._send_batch(batch, results)
+                batch, batch_bytes = [], 0
+            batch.append((idx, entry))
+            batch_bytes += size
+        if batch:
+            self._send_batch(batch, results)
+        return results
+
+    def _send_batch(
+        self, batch: List[tuple[int, dict]], results: List[SQSSendResult]
+    ) -> None:
+        try:
+            response = self.sqs_client.send_message_batch(
+                QueueUrl=self.config.queue_url,
+                Entries=[{"Id": str(idx), **entry} for idx, entry in batch],
+            )
+        except (BotoCoreError, ClientError) as e:
+            logger.info(
+                "SQS_MESSAGE_BATCH_TRIGGER_FAILED",
+                context={"batch_size": len(batch), "error": str(e)},
+            )
+            for idx, _ in batch:
+                results[idx].error = f"Failed to send message to SQS: {e}"
+            return
+
+        for success in response.get("Successful", []):
+            results[int(success["Id"])].message_id = success.get("MessageId")
+        for failure in response.get("Failed", []):
+            results[int(failure["Id"])].error = (
+                f"{failure.get('Code')}: {failure.get('Message')}"
+            )
+        logger.info(
+            "SQS_MESSAGE_BATCH_TRIGGER_SUCCESS",
+            context={
+                "batch_size": len(batch),
+                "failed": len(response.get("Failed", [])),
+            },
+        )
+
+    def _build_entry(
+        self,
+        message_body: dict,
+        message_attributes: Optional[dict],
+        group_key: Optional[str] = None,
+    ) -> dict:
+        serialized = json.dumps(message_body)
+        dedupe_id = str(uuid.uuid4())
+        if self.config.message_group.content_based_deduplication:
+            dedupe_id = hashlib.sha256(serialized.encode()).hexdigest()
+        return {
+            "MessageBody": self._claim_check(message_body, serialized),
+            "MessageAttributes": self._format_message_attributes(message_attributes),
+            "MessageGroupId": group_key or self._group_id(message_body, serialized),
+            "MessageDeduplicationId": dedupe_id,
+        }
+
+    def _claim_check(self, message_body: dict, serialized: str) -> str:
+        """
+        Stores bodies above the claim check threshold in S3, optionally
+        compressed, and returns the small pointer to enqueue in their place.
+        The pointer carries the dedupe key field of the body, so consumers
+        can skip duplicates without downloading the payload.
+        """
+        claim_cfg = self.config.claim_check
+        data = serialized.encode()
+        if claim_cfg is None or len(data) <= claim_cfg.threshold_bytes:
+            return serialized
+        assert self.s3_client is not None
+
+        encoding = "identity"
+        if claim_cfg.compress:
+            data = gzip.compress(data)
+            encoding = "gzip"
+        key = f"{claim_cfg.prefix}{uuid.uuid4().hex}.json"
+        self.s3_client.upload_bytes(
+            data, bucket=claim_cfg.bucket, key=key, content_type="application/json"
+        )
+        pointer: dict[str, Any] = {
+            "bucket": claim_cfg.bucket,
+            "key": key,
+            "encoding": encoding,
+            "size": len(serialized),
+        }
+        if self.config.dedupe is not None:
+            dedupe_key = field_value(message_body, self.config.dedupe.key_field)
+            if dedupe_key is not None:
+                pointer["dedupe_key"] = str(dedupe_key)
+        return json.dumps({CLAIM_CHECK_KEY: pointer})
+
+    def _group_id(self, message_body: dict, serialized: str) -> str:
+        """
+        Resolves the FIFO message group of a message. Ordering only holds within
+        a group, so spreading messages over several groups lets that many
+        consumers work on the queue in parallel.
+        """
+        group_cfg = self.config.message_group
+        if group_cfg.strategy == SqsGroupStrategy.FIXED:
+            return group_cfg.group_id
+
+        value = field_value(message_body, group_cfg.field)
+        if value is None:
+            if group_cfg.strategy == SqsGroupStrategy.FIELD:
+                return group_cfg.group_id
+            # without a usable field the whole body decides the shard
+            value = serialized
+
+        if group_cfg.strategy == SqsGroupStrategy.FIELD:
+            return self._valid_group_id(str(value))
+        shard = zlib.crc32(str(value).encode()) % group_cfg.shards
+        return f"{group_cfg.group_id}-{shard}"
+
+    @staticmethod
+    def _valid_group_id(value: str) -> str:
+        """
+        Returns value if SQS accepts it as a message group id, otherwise its
+        hash. Hashing keeps distinct values in distinct groups, which cutting
+        or replacing characters would not.
+        """
+        if 0 < len(value) <= MAX_GROUP_ID_LENGTH and GROUP_ID_CHARS.issuperset(value):
+            return value
+        return hashlib.sha256(value.encode()).hexdigest()
+
+    @staticmethod
+    def _entry_size(entry: dict) -> int:
+        size = len(entry["MessageBody"].encode())
+        for key, value in entry["MessageAttributes"].items():
+            size += len(key.encode()) + len(value["DataType"].encode())
+            size += len(value["StringValue"].encode())
+        return size
+
     @staticmethod
     def _format_message_attributes(attributes: Optional[dict]) -> dict:
         """
@@ -88,3 +414,187 @@ class SQSMessageSender:
             for key, value in attributes.items()
         }
         return formatted_attributes
+
+
+class AsyncSQSMessageSender:
+    """
+    Non-blocking counterpart of SQSMessageSender for async code such as the
+    FastAPI routes. Calls go through one shared boto3 client whose connection
+    pool, like the thread pool running the calls, is sized by send_pool_size,
+    so enqueueing never blocks the event loop.
+    """
+
+    def __init__(self, config: AwsSQSConfig, s3_client: Optional[S3Client] = None):
+        self.config = config
+        self.sender = SQSMessageSender(config, s3_client=s3_client)
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.send_pool_size,
+            thread_name_prefix="sqs-sender",
+        )
+
+    async def send_message(
+        self,
+        message_body: dict,
+        message_attributes: dict = None,
+        group_key: Optional[str] = None,
+    ) -> dict:
+        """
+        Sends a message to the SQS queue, see SQSMessageSender.send_message.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            self.sender.send_message,
+            message_body,
+            message_attributes,
+            group_key,
+        )
+
+    async def send_messages(
+        self,
+        message_bodies: List[dict],
+        message_attributes: Optional[List[Optional[dict]]] = None,
+        group_keys: Optional[List[Optional[str]]] = None,
+    ) -> List[SQSSendResult]:
+        """
+        Sends messages in batches, see SQSMessageSender.send_messages.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            self.sender.send_messages,
+            message_bodies,
+            message_attributes,
+            group_keys,
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_PendingMessage = tuple[dict, Optional[dict], Optional[str], Future]
+
+
+class SQSBatchFlusher:
+    """
+    Buffers messages in memory and sends them from a background thread with
+    SQSMessageSender.send_messages, flushing once a full batch is buffered or
+    the first buffered message waited for the linger time. Serialization and
+    the API calls happen on the flusher thread, callers only get a future
+    resolved with the SQSSendResult of their message.
+    """
+
+    def __init__(self, sender: SQSMessageSender, linger_ms: Optional[int] = None):
+        self._sender = sender
+        linger = sender.config.send_batch_linger_ms if linger_ms is None else linger_ms
+        self._linger_sec = linger / 1000
+        self._queue: queue.Queue[Optional[_PendingMessage]] = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="sqs-batch-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        message_body: dict,
+        message_attributes: Optional[dict] = None,
+        group_key: Optional[str] = None,
+    ) -> "Future[SQSSendResult]":
+        if self._closed:
+            raise RuntimeError("SQSBatchFlusher is closed")
+        future: Future[SQSSendResult] = Future()
+        self._queue.put((message_body, message_attributes, group_key, future))
+        return future
+
+    def close(self) -> None:
+        """Flushes every buffered message and stops the flusher thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self._linger_sec
+            while len(batch) < MAX_BATCH_ENTRIES:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+        # messages submitted while closing are still sent
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                remaining.append(item)
+        for start in range(0, len(remaining), MAX_BATCH_ENTRIES):
+            self._flush(remaining[start : start + MAX_BATCH_ENTRIES])
+
+    def _flush(self, batch: List["_PendingMessage"]) -> None:
+        try:
+            results = self._sender.send_messages(
+                [body for body, _, _, _ in batch],
+                [attrs for _, attrs, _, _ in batch],
+                [group_key for _, _, group_key, _ in batch],
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        for (*_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class ClaimCheckResolver:
+    """
+    Resolves claim check pointers enqueued by SQSMessageSender back into the
+    original bodies. Resolved bodies are kept in a small LRU so that
+    redeliveries do not download the payload again.
+    """
+
+    def __init__(self, config: SqsClaimCheckConfig, s3_client: S3Client):
+        self._s3_client = s3_client
+        self._cache_size = config.cache_size
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_pointer(body: Any) -> bool:
+        return isinstance(body, dict) and set(body.keys()) == {CLAIM_CHECK_KEY}
+
+    def resolve(self, body: Any) -> Any:
+        """Returns the original body for a pointer, other bodies unchanged."""
+        if not self.is_pointer(body):
+            return body
+        pointer = body[CLAIM_CHECK_KEY]
+        with self._lock:
+            if pointer["key"] in self._cache:
+                self._cache.move_to_end(pointer["key"])
+                return self._cache[pointer["key"]]
+
+        response = self._s3_client.client.get_object(
+            Bucket=pointer["bucket"], Key=pointer["key"]
+        )
+        data = response["Body"].read()
+        if pointer.get("encoding") == "gzip":
+            data = gzip.decompress(data)
+        resolved = json.loads(data)
+
+        with self._lock:
+            self._cache[pointer["key"]] = resolved
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return resolved
@@ -0,0 +1,156 @@
+"""
+This module provides the batched acknowledgement and visibility management
+used by the SQS consumer.
+
+AckBatcher buffers processed messages and deletes them with DeleteMessageBatch
+once a batch is full or the flush interval elapsed. VisibilityHeartbeat
+periodically extends the visibility timeout of every message still in flight
+with ChangeMessageVisibilityBatch so slow messages are not redelivered while
+they are being processed.
+"""
+
+import asyncio
+from typing import Any
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from src.pkg import logging
+from src.worker import trace_codes
+
+logger = logging.get_logger()
+
+MAX_BATCH_ENTRIES = 10
+
+
+def _chunks(items: list[Any], size: int = MAX_BATCH_ENTRIES) -> list[list[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+class AckBatcher:
+    def __init__(
+        self,
+        client: Any,
+        queue_url: str,
+        batch_size: int = MAX_BATCH_ENTRIES,
+        flush_interval_ms: int = 1000,
+    ) -> None:
+        self._client = client
+        self._queue_url = queue_url
+        self._batch_size = min(batch_size, MAX_BATCH_ENTRIES)
+        self._flush_interval_sec = flush_interval_ms / 1000
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    def ack(self, message: dict[str, Any]) -> None:
+        self._queue.put_nowait(message)
+
+    async def join(self) -> None:
+        """Waits until every acked message was flushed."""
+        await self._queue.join()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._flush_interval_sec
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._delete_batch, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _delete_batch(self, messages: list[dict[str, Any]]) -> None:
+        entries = [
+            {"Id": str(idx), "ReceiptHandle": message["ReceiptHandle"]}
+            for idx, message in enumerate(messages)
+        ]
+        try:
+            response = self._client.delete_message_batch(
+                QueueUrl=self._queue_url,
+                Entries=entries,
+            )
+        except (BotoCoreError, ClientError):
+            logger.exception(
+                trace_codes.WORKER_ACK_FAILED,
+                context={"message_ids": [m.get("MessageId") for m in messages]},
+            )
+            return
+
+        for failure in response.get("Failed", []):
+            logger.error(
+                trace_codes.WORKER_ACK_FAILED,
+                context={
+                    "message_id": messages[int(failure["Id"])].get("MessageId"),
+                    "code": failure.get("Code"),
+                    "reason": failure.get("Message"),
+                },
+            )
+
+
+class VisibilityHeartbeat:
+    def __init__(
+        self,
+        client: Any,
+        queue_url: str,
+        visibility_timeout_sec: int,
+        interval_sec: int,
+    ) -> None:
+        self._client = client
+        self._queue_url = queue_url
+        self._visibility_timeout_sec = visibility_timeout_sec
+        self._interval_sec = interval_sec
+        self._in_flight: dict[str, str] = {}
+
+    def track(self, message: dict[str, Any]) -> None:
+        self._in_flight[message["MessageId"]] = message["ReceiptHandle"]
+
+    def untrack(self, message: dict[str, Any]) -> None:
+        self._in_flight.pop(message["MessageId"], None)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval_sec)
+            in_flight = list(self._in_flight.items())
+            for chunk in _chunks(in_flight):
+                await asyncio.to_thread(self._extend, chunk)
+
+    def _extend(self, chunk: list[tuple[str, str]]) -> None:
+        entries = [
+            {
+                "Id": str(idx),
+                "ReceiptHandle": receipt_handle,
+                "VisibilityTimeout": self._visibility_timeout_sec,
+            }
+            for idx, (_, receipt_handle) in enumerate(chunk)
+        ]
+        try:
+            response = self._client.change_message_visibility_batch(
+                QueueUrl=self._queue_url,
+                Entries=entries,
+            )
+        except (BotoCoreError, ClientError):
+            logger.exception(
+                trace_codes.WORKER_VISIBILITY_EXTEND_FAILED,
+                context={"message_ids": [message_id for message_id, _ in chunk]},
+            )
+            return
+
+        for failure in response.get("Failed", []):
+            message_id = chunk[int(failure["Id"])][0]
+            # the receipt handle is no longer valid, extending it again is futile
+            self._in_flight.pop(message_id, None)
+            logger.error(
+                trace_codes.WORKER_VISIBILITY_EXTEND_FAILED,
+                context={
+                    "message_id": message_id,
+                    "code": failure.get("Code"),
+                    "reason": failure.get("Message"),
+                },
+            )
@@ -0,0 +1,546 @@
+"""
+This module provides the native asyncio SQS consumer.
+
+Receiving, processing and acking run as a pipeline on one event loop: a
+receive loop keeps a small bounded prefetch buffer filled, polling again right
+away while receives come back full and backing off exponentially while they
+come back empty. A dispatch loop moves buffered messages to a bounded pool,
+where each message is executed either as a MessageHandler.handle_message_async
+coroutine or on a thread pool running MessageHandler.handle_message, and
+successfully processed messages are handed to an AckBatcher which deletes them
+in batches without holding a pool slot.
+
+In batch mode messages are accumulated into batches of up to
+max_number_of_messages and passed to MessageHandler.handle_batch; only the
+messages reported as failed return to the queue. When a visibility timeout is
+configured a VisibilityHeartbeat keeps extending it for messages in flight,
+including the prefetched ones. With an IdempotencyGuard, messages whose work
+already completed are acked without running the handler, and with a
+Quarantine, messages which used up their attempts are stored aside and acked.
+Blocking boto3 calls are offloaded to threads so they overlap with message
+processing.
+"""
+
+import asyncio
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, Optional
+
+import boto3
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError
+
+from src.pkg import logging
+from src.pkg.s3 import S3Client
+from src.pkg.sqs import AwsSQSConfig, SqsConsumerMode
+from src.worker import trace_codes
+from src.worker.acks import AckBatcher, VisibilityHeartbeat
+from src.worker.dedupe import IdempotencyGuard
+from src.worker.handler import BatchResult, MessageHandler, SqsAttrs
+from src.worker.quarantine import Quarantine
+
+logger = logging.get_logger()
+
+ATTRIBUTE_NAMES = [
+    "ApproximateReceiveCount",
+    "SentTimestamp",
+    "SenderId",
+    "AWSTraceHeader",
+    # returned for FIFO queues only, keeps quarantined messages in their group
+    "MessageGroupId",
+]
+MAX_RECEIVE_BATCH = 10
+
+
+class PooledConsumer:
+    def __init__(
+        self,
+        config: AwsSQSConfig,
+        handler: MessageHandler,
+        aws_access_key: Optional[str] = None,
+        aws_secret_key: Optional[str] = None,
+        sqs_client: Any = None,
+        idempotency: Optional[IdempotencyGuard] = None,
+        s3_client: Optional[S3Client] = None,
+    ) -> None:
+        self.config = config
+        self._handler = handler
+        self._idempotency = idempotency
+        self._client = sqs_client or boto3.client(
+            "sqs",
+            region_name=config.region,
+            endpoint_url=config.endpoint,
+            aws_access_key_id=aws_access_key,
+            aws_secret_access_key=aws_secret_key,
+            config=BotoConfig(max_pool_connections=config.max_in_flight + 1),
+        )
+        self._quarantine: Optional[Quarantine] = None
+        if config.quarantine is not None:
+            self._quarantine = Quarantine(
+                config.quarantine,
+                queue_url=config.queue_url,
+                sqs_client=self._client,
+                s3_client=s3_client,
+            )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._acks: Optional[AckBatcher] = None
+        self._heartbeat: Optional[VisibilityHeartbeat] = None
+        self._buffer: Optional[asyncio.Queue[Optional[dict[str, Any]]]] = None
+        self._buffer_space: Optional[asyncio.Semaphore] = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._in_flight = 0
+        self._backoff_sec = 0.0
+        self._polls = 0
+        self._empty_polls = 0
+        self._received = 0
+
+    def listen(self) -> None:
+        asyncio.run(self._listen())
+
+    def stop(self) -> None:
+        """
+        Stops receiving new messages. Messages already in flight are
+        drained before listen returns.
+        """
+        logger.info(trace_codes.WORKER_CONSUMER_STOPPING)
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def _listen(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        self._stop_event = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.config.max_in_flight)
+        self._buffer = asyncio.Queue()
+        self._buffer_space = asyncio.Semaphore(self.config.prefetch_size)
+        self._acks = AckBatcher(
+            client=self._client,
+            queue_url=self.config.queue_url,
+            batch_size=self.config.ack_batch_size,
+            flush_interval_ms=self.config.ack_flush_interval_ms,
+        )
+        if self.config.visibility_timeout_sec is not None:
+            self._heartbeat = VisibilityHeartbeat(
+                client=self._client,
+                queue_url=self.config.queue_url,
+                visibility_timeout_sec=self.config.visibility_timeout_sec,
+                interval_sec=self.config.heartbeat_interval_sec,
+            )
+        if self.config.consumer_mode == SqsConsumerMode.THREAD:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.config.max_in_flight,
+                thread_name_prefix="sqs-worker",
+            )
+
+        logger.info(
+            trace_codes.WORKER_CONSUMER_STARTED,
+            context={
+                "queue_url": self.config.queue_url,
+                "mode": self.config.consumer_mode.value,
+                "max_in_flight": self.config.max_in_flight,
+            },
+        )
+        receiver = asyncio.create_task(self._receive_loop())
+        background = [
+            asyncio.create_task(self._acks.run()),
+            asyncio.create_task(self._stats_loop()),
+        ]
+        if self._heartbeat is not None:
+            background.append(asyncio.create_task(self._heartbeat.run()))
+        try:
+            await self._dispatch_loop()
+        finally:
+            receiver.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self._acks.join()
+            for task in background:
+                task.cancel()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            # an unexpected error of the receive loop must fail the worker
+            # instead of letting it exit as if it had been stopped
+            try:
+                await receiver
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the current receive metrics: prefetch buffer depth, messages
+        in flight, the current empty-queue backoff and the poll counters
+        since the last stats report.
+        """
+        return {
+            "buffer_depth": self._buffer.qsize() if self._buffer else 0,
+            "in_flight": self._in_flight,
+            "backoff_ms": int(self._backoff_sec * 1000),
+            "polls": self._polls,
+            "empty_polls": self._empty_polls,
+            "received": self._received,
+        }
+
+    async def _receive_loop(self) -> None:
+        """
+        Keeps the prefetch buffer filled. While receives come back full the
+        queue is polled again right away, once a receive comes back empty
+        polling backs off exponentially up to poll_interval_sec.
+        """
+        assert self._stop_event is not None
+        assert self._buffer is not None and self._buffer_space is not None
+        wait_time = self.config.wait_time_sec
+        try:
+            while not self._stop_event.is_set():
+                requested = await self._acquire(
+                    self._buffer_space,
+                    min(self.config.max_number_of_messages, MAX_RECEIVE_BATCH),
+                )
+                if self._stop_event.is_set():
+                    self._release_n(self._buffer_space, requested)
+                    break
+                try:
+                    messages = await asyncio.to_thread(
+                        self._receive, requested, wait_time
+                    )
+                except (BotoCoreError, ClientError):
+                    # throttling or an endpoint blip must not end the consumer
+                    self._release_n(self._buffer_space, requested)
+                    self._increase_backoff()
+                    logger.exception(
+                        trace_codes.WORKER_RECEIVE_FAILED,
+                        context={
+                            "queue_url": self.config.queue_url,
+                            "retry_in_ms": int(self._backoff_sec * 1000),
+                        },
+                    )
+                    await self._sleep(self._backoff_sec)
+                    continue
+                self._release_n(self._buffer_space, requested - len(messages))
+                self._polls += 1
+                self._received += len(messages)
+                for message in messages:
+                    if self._heartbeat is not None:
+                        self._heartbeat.track(message)
+                    self._buffer.put_nowait(message)
+
+                if messages:
+                    self._backoff_sec = 0
+                    # a full receive means there is a backlog, skip the long poll
+                    wait_time = (
+                        0 if len(messages) == requested else self.config.wait_time_sec
+                    )
+                    continue
+                self._empty_polls += 1
+                wait_time = self.config.wait_time_sec
+                self._increase_backoff()
+                await self._sleep(self._backoff_sec)
+        finally:
+            self._buffer.put_nowait(None)
+
+    def _increase_backoff(self) -> None:
+        self._backoff_sec = min(
+            max(self._backoff_sec * 2, self.config.min_poll_interval_ms / 1000),
+            self.config.poll_interval_sec,
+        )
+
+    async def _dispatch_loop(self) -> None:
+        """
+        Moves messages from the prefetch buffer to the pool, one task per
+        message or, in batch mode, one task per accumulated batch. Returns
+        once the receive loop stopped and the buffer is drained.
+        """
+        assert self._slots is not None
+        assert self._buffer is not None and self._buffer_space is not None
+        loop = asyncio.get_running_loop()
+        batch_size = self.config.max_number_of_messages
+        pending: list[dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            # a batch is dispatched once it is full, its accumulation window
+            # elapsed or the pool has no slot left to grow it any further
+            if pending and (
+                len(pending) >= batch_size
+                or loop.time() >= deadline
+                or self._slots.locked()
+            ):
+                self._spawn(self._process_batch(pending))
+                pending = []
+
+            await self._slots.acquire()
+            timeout = max(deadline - loop.time(), 0) if pending else None
+            try:
+                message = await self._next_message(timeout)
+            except asyncio.TimeoutError:
+                self._slots.release()
+                continue
+            if message is None:
+                self._slots.release()
+                break
+            self._buffer_space.release()
+            self._in_flight += 1
+
+            if not self.config.batch_mode:
+                self._spawn(self._process(message))
+                continue
+            if not pending:
+                deadline = loop.time() + self.config.batch_window_ms / 1000
+            pending.append(message)
+            # messages of the same receive are batched without any window
+            await self._take_buffered(pending, batch_size)
+
+        if pending:
+            self._spawn(self._process_batch(pending))
+
+    async def _take_buffered(
+        self, pending: list[dict[str, Any]], batch_size: int
+    ) -> None:
+        """
+        Moves the messages already in the prefetch buffer into the batch
+        while it has room and the pool has free slots, without waiting.
+        """
+        assert self._slots is not None
+        assert self._buffer is not None and self._buffer_space is not None
+        while len(pending) < batch_size and not self._slots.locked():
+            try:
+                message = self._buffer.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if message is None:
+                # the end marker stays last, the dispatch loop stops on it
+                self._buffer.put_nowait(None)
+                return
+            # the semaphore is not locked, this does not wait
+            await self._slots.acquire()
+            self._buffer_space.release()
+            self._in_flight += 1
+            pending.append(message)
+
+    async def _next_message(self, timeout: Optional[float]) -> Optional[dict[str, Any]]:
+        assert self._buffer is not None
+        try:
+            return self._buffer.get_nowait()
+        except asyncio.QueueEmpty:
+            if timeout == 0:
+                raise asyncio.TimeoutError from None
+        return await asyncio.wait_for(self._buffer.get(), timeout)
+
+    async def _stats_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.stats_interval_sec)
+            stats = self.stats()
+            stats["polls_per_sec"] = round(
+                self._polls / self.config.stats_interval_sec, 2
+            )
+            logger.info(trace_codes.WORKER_RECEIVE_STATS, context=stats)
+            self._polls = self._empty_polls = self._received = 0
+
+    def _spawn(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _acquire(semaphore: asyncio.Semaphore, limit: int) -> int:
+        """
+        Waits for at least one free slot of the semaphore, then grabs as
+        many of the remaining free slots as possible up to limit.
+        """
+        await semaphore.acquire()
+        acquired = 1
+        while acquired < limit and not semaphore.locked():
+            await semaphore.acquire()
+            acquired += 1
+        return acquired
+
+    @staticmethod
+    def _release_n(semaphore: asyncio.Semaphore, count: int) -> None:
+        for _ in range(count):
+            semaphore.release()
+
+    async def _sleep(self, seconds: float) -> None:
+        assert self._stop_event is not None
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process(self, message: dict[str, Any]) -> None:
+        assert self._acks is not None
+        try:
+            parsed = self._parse(message)
+            if parsed is None:
+                await self._give_up(message, ValueError("invalid message body"))
+                return
+            body, attrs = parsed
+            if await self._is_duplicate(message, body) or await self._is_poison(
+                message, attrs
+            ):
+                return
+            try:
+                await self._execute(body, attrs)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # already logged by the handler, unless it used up its attempts
+                # the message becomes visible again once its visibility timeout
+                # expires
+                if self._quarantine is not None and self._quarantine.exhausted(attrs):
+                    await self._give_up(message, e)
+                return
+            await self._complete(message, body)
+        finally:
+            self._release(message)
+
+    async def _process_batch(self, messages: list[dict[str, Any]]) -> None:
+        assert self._acks is not None
+        try:
+            valid: list[dict[str, Any]] = []
+            bodies: list[Any] = []
+            attrs: list[SqsAttrs] = []
+            for message in messages:
+                parsed = self._parse(message)
+                if parsed is None:
+                    await self._give_up(message, ValueError("invalid message body"))
+                    continue
+                if await self._is_duplicate(
+                    message, parsed[0]
+                ) or await self._is_poison(message, parsed[1]):
+                    continue
+                valid.append(message)
+                bodies.append(parsed[0])
+                attrs.append(parsed[1])
+            if not valid:
+                return
+            error: Optional[Exception] = None
+            try:
+                result = await self._execute_batch(bodies, attrs)
+                failed = set(result.failed_indices)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.exception(
+                    trace_codes.WORKER_BATCH_FAILED,
+                    context={"batch_size": len(valid)},
+                )
+                error = e
+                failed = set(range(len(valid)))
+            for idx, message in enumerate(valid):
+                if idx not in failed:
+                    await self._complete(message, bodies[idx])
+                elif self._quarantine is not None and self._quarantine.exhausted(
+                    attrs[idx]
+                ):
+                    await self._give_up(
+                        message,
+                        error or RuntimeError("reported failed by handle_batch"),
+                    )
+        finally:
+            for message in messages:
+                self._release(message)
+
+    def _parse(self, message: dict[str, Any]) -> Optional[tuple[Any, SqsAttrs]]:
+        try:
+            body = json.loads(message["Body"])
+        except ValueError:
+            logger.exception(
+                trace_codes.WORKER_INVALID_REQUEST,
+                context={"message_id": message.get("MessageId")},
+            )
+            return None
+        return body, SqsAttrs.parse(message.get("Attributes"))
+
+    async def _is_duplicate(self, message: dict[str, Any], body: Any) -> bool:
+        """Acks the message if its work was already completed before."""
+        assert self._acks is not None
+        if self._idempotency is None:
+            return False
+        key = self._idempotency.key(message, body)
+        try:
+            duplicate = await self._idempotency.seen(key)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception(
+                trace_codes.WORKER_DEDUPE_FAILED,
+                context={"message_id": message.get("MessageId")},
+            )
+            return False
+        if duplicate:
+            logger.info(
+                trace_codes.WORKER_DUPLICATE_SKIPPED,
+                context={"message_id": message.get("MessageId"), "dedupe_key": key},
+            )
+            self._acks.ack(message)
+        return duplicate
+
+    async def _is_poison(self, message: dict[str, Any], attrs: SqsAttrs) -> bool:
+        """
+        Quarantines a message received more often than allowed without
+        running it, e.g. because it crashed the worker on earlier attempts.
+        """
+        if self._quarantine is None:
+            return False
+        if attrs.attempts <= self._quarantine.config.max_attempts:
+            return False
+        await self._give_up(message, None)
+        return True
+
+    async def _give_up(
+        self, message: dict[str, Any], error: Optional[BaseException]
+    ) -> None:
+        assert self._acks is not None
+        if self._quarantine is None:
+            return
+        if await self._quarantine.quarantine(message, error):
+            self._acks.ack(message)
+
+    async def _complete(self, message: dict[str, Any], body: Any) -> None:
+        assert self._acks is not None
+        if self._idempotency is not None:
+            try:
+                await self._idempotency.mark(self._idempotency.key(message, body))
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception(
+                    trace_codes.WORKER_DEDUPE_FAILED,
+                    context={"message_id": message.get("MessageId")},
+                )
+        self._acks.ack(message)
+
+    def _release(self, message: dict[str, Any]) -> None:
+        assert self._slots is not None
+        if self._heartbeat is not None:
+            self._heartbeat.untrack(message)
+        self._slots.release()
+        self._in_flight -= 1
+
+    async def _execute(self, body: Any, attrs: SqsAttrs) -> None:
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self._executor, self._handler.handle_message, body, attrs
+            )
+            return
+        await self._handler.handle_message_async(body, attrs)
+
+    async def _execute_batch(
+        self, bodies: list[Any], attrs: list[SqsAttrs]
+    ) -> BatchResult:
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self._handler.handle_batch, bodies, attrs
+            )
+        return await self._handler.handle_batch_async(bodies, attrs)
+
+    def _receive(self, max_messages: int, wait_time_sec: int) -> list[dict[str, Any]]:
+        kwargs: dict[str, Any] = {}
+        if self.config.visibility_timeout_sec is not None:
+            kwargs["VisibilityTimeout"] = self.config.visibility_timeout_sec
+        response = self._client.receive_message(
+            QueueUrl=self.config.queue_url,
+            AttributeNames=ATTRIBUTE_NAMES,
+            MessageAttributeNames=["All"],
+            WaitTimeSeconds=wait_time_sec,
+            MaxNumberOfMessages=max_messages,
+            **kwargs,
+        )
+        return response.get("Messages", [])
@@ -0,0 +1,152 @@
+"""
+This module provides the idempotency layer of the worker.
+
+Every successfully processed message is recorded under its dedupe key, the
+SQS message ID or a configurable field of the body. A redelivered message
+whose key was already recorded is acked without running the handler. Keys are
+kept in an in-process LRU with TTL and, optionally, in a Postgres table so
+that the dedupe holds across pods.
+
+The key is computed before the handler resolves claim check pointers. For
+bodies offloaded to S3 the sender copies the key field into the pointer, so
+the key matches the one of an inline body and duplicates are skipped without
+downloading the payload.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Protocol
+
+from sqlalchemy import BigInteger, Column, delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.pkg import utils
+from src.pkg.db import BaseModel, IHandler
+from src.pkg.sqs import CLAIM_CHECK_KEY, ClaimCheckResolver, SqsDedupeConfig
+
+
+class ProcessedMessage(BaseModel):
+    __tablename__ = "processed_messages"
+
+    expires_at = Column(BigInteger, nullable=False, index=True)
+
+
+class IIdempotencyStore(Protocol):  # pragma: no cover
+    def seen(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def mark(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LruTtlCache:
+    def __init__(self, max_entries: int, ttl_sec: int) -> None:
+        self._max_entries = max_entries
+        self._ttl_ms = ttl_sec * 1000
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= utils.time_ms():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def mark(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = utils.time_ms() + self._ttl_ms
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class PostgresIdempotencyStore:
+    def __init__(self, db_handler: IHandler, ttl_sec: int) -> None:
+        self._db = db_handler
+        self._ttl_ms = ttl_sec * 1000
+        self._last_purge_ms = 0
+
+    def seen(self, key: str) -> bool:
+        with self._db.get_session() as session:
+            found = session.execute(
+                select(ProcessedMessage.id).where(
+                    ProcessedMessage.id == key,
+                    ProcessedMessage.expires_at > utils.time_ms(),
+                )
+            ).first()
+        return found is not None
+
+    def mark(self, key: str) -> None:
+        now = utils.time_ms()
+        stmt = insert(ProcessedMessage).values(
+            id=key,
+            created_at=now,
+            updated_at=now,
+            expires_at=now + self._ttl_ms,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProcessedMessage.id],
+            set_={"updated_at": now, "expires_at": now + self._ttl_ms},
+        )
+        with self._db.get_session() as session:
+            session.execute(stmt)
+            # expired keys are purged at most once per ttl so the table stays bounded
+            if now - self._last_purge_ms > self._ttl_ms:
+                session.execute(
+                    delete(ProcessedMessage).where(ProcessedMessage.expires_at <= now)
+                )
+                self._last_purge_ms = now
+            session.commit()
+
+
+class IdempotencyGuard:
+    def __init__(
+        self, config: SqsDedupeConfig, db_handler: Optional[IHandler] = None
+    ) -> None:
+        self._key_path = config.key_field.split(".") if config.key_field else []
+        self._cache = LruTtlCache(
+            max_entries=config.max_entries, ttl_sec=config.ttl_sec
+        )
+        self._store: Optional[IIdempotencyStore] = None
+        if config.use_db:
+            if db_handler is None:
+                raise ValueError("dedupe.use_db requires a database handler")
+            self._store = PostgresIdempotencyStore(db_handler, config.ttl_sec)
+
+    def key(self, message: dict[str, Any], body: Any) -> str:
+        """
+        Returns the dedupe key of a message, the configured body field when
+        it is present and the SQS message ID otherwise.
+        """
+        if ClaimCheckResolver.is_pointer(body):
+            dedupe_key = body[CLAIM_CHECK_KEY].get("dedupe_key")
+            return message["MessageId"] if dedupe_key is None else dedupe_key
+        value: Any = body
+        for part in self._key_path:
+            if not isinstance(value, dict) or part not in value:
+                return message["MessageId"]
+            value = value[part]
+        if not self._key_path or value is None:
+            return message["MessageId"]
+        return str(value)
+
+    async def seen(self, key: str) -> bool:
+        if self._cache.seen(key):
+            return True
+        if self._store is None:
+            return False
+        if await asyncio.to_thread(self._store.seen, key):
+            self._cache.mark(key)
+            return True
+        return False
+
+    async def mark(self, key: str) -> None:
+        self._cache.mark(key)
+        if self._store is not None:
+            await asyncio.to_thread(self._store.mark, key)
@@ -0,0 +1,156 @@
+import asyncio
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+from typing_extensions import Self
+
+from src.pkg import logging, utils
+from src.pkg.sqs import ClaimCheckResolver
+from src.worker import trace_codes
+
+logger = logging.get_logger()
+
+
+class SqsAttrs(BaseModel):
+    attempts: int = 0
+    sender_id: str = ""
+    sent_time_ms: int = 0
+    aws_trace_hdr: str = ""
+
+    @classmethod
+    def parse(cls, attrs: Any) -> Self:
+        if attrs is None:
+            return cls()
+        return cls(
+            attempts=attrs.get("ApproximateReceiveCount", 0),
+            sender_id=attrs.get("SenderId", ""),
+            sent_time_ms=attrs.get("SentTimestamp", 0),
+            aws_trace_hdr=attrs.get("AWSTraceHeader", ""),
+        )
+
+
+class BatchResult(BaseModel):
+    """
+    Outcome of a batch, failed_indices point into the bodies passed to
+    handle_batch. Only the failed messages are returned to the queue.
+    """
+
+    failed_indices: List[int] = []
+
+
+class MessageHandler:
+    def __init__(
+        self, queue_url: str, claim_check: Optional[ClaimCheckResolver] = None
+    ) -> None:
+        self._queue_url = queue_url
+        self._claim_check = claim_check
+
+    def handle_message(
+        self,
+        body: Any,
+        attributes: SqsAttrs,
+    ):
+        start_time = self.__on_initiated(attributes)
+        try:
+            if self._claim_check is not None:
+                body = self._claim_check.resolve(body)
+            self.__process_message(body)
+        except Exception as e:  # pylint: disable=W0718:broad-exception-caught
+            self.__on_failed(attributes, start_time)
+            raise e
+        self.__on_completed(attributes, start_time)
+
+    async def handle_message_async(
+        self,
+        body: Any,
+        attributes: SqsAttrs,
+    ):
+        """
+        Entry point of the worker in asyncio mode. The default runs
+        handle_message on a thread, so processing lives in one place; override
+        it with a native coroutine when the processing is I/O bound and should
+        not hold a thread.
+        """
+        await asyncio.to_thread(self.handle_message, body, attributes)
+
+    def handle_batch(
+        self,
+        bodies: List[Any],
+        attributes: List[SqsAttrs],
+    ) -> BatchResult:
+        """
+        Processes the messages of a batch. The default implementation handles
+        them one by one; override it to process the batch as a group, e.g. with
+        one bulk insert, and report the indices of the bodies which failed.
+        """
+        failed: List[int] = []
+        for idx, (body, attrs) in enumerate(zip(bodies, attributes)):
+            try:
+                self.handle_message(body, attrs)
+            except Exception:  # pylint: disable=broad-exception-caught
+                failed.append(idx)
+        return BatchResult(failed_indices=failed)
+
+    async def handle_batch_async(
+        self,
+        bodies: List[Any],
+        attributes: List[SqsAttrs],
+    ) -> BatchResult:
+        """
+        Coroutine counterpart of handle_batch. The default runs handle_batch
+        on a thread, override it to process the batch natively.
+        """
+        return await asyncio.to_thread(self.handle_batch, bodies, attributes)
+
+    def __on_initiated(self, attributes: SqsAttrs) -> int:
+        logging.init_logger_context()
+        logging.bind_to_context(app_source="worker")
+
+        logging.bind_to_context(
+            attempt=attributes.attempts,
+        )
+
+        logger.info(
+            trace_codes.WORKER_REQUEST_INITIATED,
+            context={
+                "sent_time_ms": attributes.sent_time_ms,
+                "log_time_ms": utils.time_ms(),
+                "queue_url": self._queue_url,
+                "sqs": attributes.model_dump(),
+            },
+        )
+        return utils.time_ms()
+
+    def __on_failed(self, attributes: SqsAttrs, start_time: int) -> None:
+        logger.exception(
+            trace_codes.WORKER_REQUEST_FAILED,
+            context={
+                "sent_time_ms": attributes.sent_time_ms,
+                "log_time_ms": utils.time_ms(),
+                "process_time_ms": utils.time_ms() - start_time,
+            },
+        )
+        logging.clear_context()
+
+    def __on_completed(self, attributes: SqsAttrs, start_time: int) -> None:
+        process_time = utils.time_ms() - start_time
+
+        logger.info(
+            trace_codes.WORKER_REQUEST_COMPLETED,
+            context={
+                "sent_time_ms": attributes.sent_time_ms,
+                "log_time_ms": utils.time_ms(),
+                "processing_time": process_time,
+            },
+        )
+        logging.clear_context()
+
+    def __process_message(self, body: Any) -> None:
+        try:
+            # TODO: Implement request validation and get_services here
+            pass
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception(
+                trace_codes.WORKER_INVALID_REQUEST,
+            )
+            return
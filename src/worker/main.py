@@ -2,126 +2,96 @@ from typing import Any
 
 import ddtrace.auto  # type: ignore pylint: disable=unused-import
 from ddtrace import patch_all
-from pydantic import BaseModel
 from sqs_listener import SqsListener  # type: ignore
-from typing_extensions import Self
 
-from src.builder import get_config, get_services
-from src.builder.helper import fetch_config_and_build_services
-from src.pkg import logging, utils
-from src.worker import trace_codes
+from src.builder import get_clients, get_config, get_services
+from src.builder.helper import fetch_config, fetch_config_and_build_services
+from src.pkg import logging
+from src.pkg.sqs import ClaimCheckResolver, SqsConsumerMode
+from src.worker.consumer import ATTRIBUTE_NAMES, PooledConsumer
+from src.worker.dedupe import IdempotencyGuard
+from src.worker.handler import MessageHandler, SqsAttrs
+from src.worker.supervisor import Supervisor
 
 logger = logging.get_logger()
 patch_all()
 
 
-class SqsAttrs(BaseModel):
-    attempts: int = 0
-    sender_id: str = ""
-    sent_time_ms: int = 0
-    aws_trace_hdr: str = ""
-
-    @classmethod
-    def parse(cls, attrs: Any) -> Self:
-        if attrs is None:
-            return cls()
-        return cls(
-            attempts=attrs.get("ApproximateReceiveCount", 0),
-            sender_id=attrs.get("SenderId", ""),
-            sent_time_ms=attrs.get("SentTimestamp", 0),
-            aws_trace_hdr=attrs.get("AWSTraceHeader", ""),
-        )
-
-
 class SimpleConsumer(SqsListener):
+    def __init__(self, queue: str, handler: MessageHandler, **kwargs: Any):
+        super().__init__(queue, **kwargs)
+        self._handler = handler
+
     def handle_message(
         self,
         body: Any,
         attributes: Any,  # pylint: disable=unused-argument
         messages_attributes: Any,
     ):
-        handler = MessageHandler(self._queue_url)  # type: ignore
-        handler.handle_message(body, SqsAttrs.parse(messages_attributes))
+        self._handler.handle_message(body, SqsAttrs.parse(messages_attributes))
 
 
-class MessageHandler:
-    def __init__(self, queue_url: str) -> None:
-        self._queue_url = queue_url
-
-    def handle_message(
-        self,
-        body: Any,
-        attributes: SqsAttrs,
-    ):
-        logging.init_logger_context()
-        logging.bind_to_context(app_source="worker")
+def main():
+    """
+    Main function to start the SQS consumer.
 
-        logging.bind_to_context(
-            attempt=attributes.attempts,
-        )
+    This function reads configuration from the environment and sets up the logger.
+    With `aws.sqs.prefork` enabled it supervises `aws.sqs.processes` forked consumer
+    processes (the CPU count by default), otherwise it runs a single consumer in
+    this process.
 
-        logger.info(
-            trace_codes.WORKER_REQUEST_INITIATED,
-            context={
-                "sent_time_ms": attributes.sent_time_ms,
-                "log_time_ms": utils.time_ms(),
-                "queue_url": self._queue_url,
-                "sqs": attributes.model_dump(),
-            },
-        )
-        start_time = utils.time_ms()
-        try:
-            self.__process_message(body)
-        except Exception as e:  # pylint: disable=W0718:broad-exception-caught
-            logger.exception(
-                trace_codes.WORKER_REQUEST_FAILED,
-                context={
-                    "sent_time_ms": attributes.sent_time_ms,
-                    "log_time_ms": utils.time_ms(),
-                    "process_time_ms": utils.time_ms() - start_time,
-                },
-            )
-            logging.clear_context()
-            raise e
-
-        process_time = utils.time_ms() - start_time
-
-        logger.info(
-            trace_codes.WORKER_REQUEST_COMPLETED,
-            context={
-                "sent_time_ms": attributes.sent_time_ms,
-                "log_time_ms": utils.time_ms(),
-                "processing_time": process_time,
-            },
-        )
-        logging.clear_context()
-
-    def __process_message(self, body: Any) -> None:
-        try:
-            #TODO: Implement request validation and get_services here
-            pass
-        except Exception:  # pylint: disable=broad-exception-caught
-            logger.exception(
-                trace_codes.WORKER_INVALID_REQUEST,
-            )
-            return
-        
+    :return: None
+    """
+    cfg = fetch_config()
+    logging.configure_logger(default_logger_names=["root"])
+    if cfg.aws.sqs.prefork:
+        Supervisor(
+            target=run_consumer,
+            processes=cfg.aws.sqs.processes,
+            drain_timeout_sec=cfg.aws.sqs.drain_timeout_sec,
+        ).run()
+        return
+    run_consumer()
 
 
-def main():
+def run_consumer():
     """
-    Main function to start the SQS consumer.
+    Builds the services and starts the SQS consumer.
 
-    This function reads configuration from the environment, sets up the logger and
-    the services, and starts the SQS consumer.
+    Depending on `aws.sqs.consumer_mode` messages are either processed one at a
+    time by the listener or concurrently on a bounded pool. Services are built
+    here rather than in main so that forked consumers create their own database
+    engines and boto3 clients.
 
     :return: None
     """
     fetch_config_and_build_services()
-    logging.configure_logger(default_logger_names=["root"])
     cfg = get_config()
+    claim_check = None
+    if cfg.aws.sqs.claim_check is not None:
+        claim_check = ClaimCheckResolver(
+            cfg.aws.sqs.claim_check, get_clients().s3_client
+        )
+    handler = MessageHandler(cfg.aws.sqs.queue_url, claim_check=claim_check)
+    if cfg.aws.sqs.consumer_mode != SqsConsumerMode.LISTENER:
+        idempotency = None
+        if cfg.aws.sqs.dedupe is not None:
+            idempotency = IdempotencyGuard(
+                cfg.aws.sqs.dedupe, db_handler=get_clients().db_handler
+            )
+        PooledConsumer(
+            config=cfg.aws.sqs,
+            handler=handler,
+            aws_access_key=cfg.aws.access_key,
+            aws_secret_key=cfg.aws.aws_secret,
+            idempotency=idempotency,
+            s3_client=get_clients().s3_client,
+        ).listen()
+        return
+
     consumer = SimpleConsumer(
         queue=cfg.aws.sqs.queue_url.split("/")[-1],
+        handler=handler,
         queue_url=cfg.aws.sqs.queue_url,
         wait_time=cfg.aws.sqs.wait_time_sec,
         interval=cfg.aws.sqs.poll_interval_sec,
@@ -131,12 +101,7 @@ def main():
         aws_access_key=cfg.aws.access_key or "",
         aws_secret_key=cfg.aws.aws_secret or "",
         endpoint_name=cfg.aws.sqs.endpoint,
-        attribute_names=[
-            "ApproximateReceiveCount",
-            "SentTimestamp",
-            "SenderId",
-            "AWSTraceHeader",
-        ],
+        attribute_names=ATTRIBUTE_NAMES,
     )
     consumer.listen()
 
@@ -0,0 +1,228 @@
+"""
+This module provides the poison message quarantine of the worker.
+
+A message that was received more than the configured number of times, or
+that cannot be parsed at all, is written to S3 (or sent to a dead letter
+queue) together with its attributes and the last error, and then acked so
+that it stops occupying worker slots.
+
+Quarantined messages can be replayed onto the queue in bulk:
+
+    python -m src.worker.quarantine replay --prefix quarantine/2026-10-17/
+    python -m src.worker.quarantine replay --from-dlq --limit 500
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+from typing import Any, Optional
+
+from src.builder.helper import fetch_config
+from src.pkg import logging, utils
+from src.pkg.s3 import S3Client
+from src.pkg.sqs import AwsSQSConfig, SqsQuarantineConfig, SQSMessageSender
+from src.worker import trace_codes
+from src.worker.handler import SqsAttrs
+
+logger = logging.get_logger()
+
+QUARANTINE_GROUP_ID = "quarantine"
+
+
+class Quarantine:
+    def __init__(
+        self,
+        config: SqsQuarantineConfig,
+        queue_url: str,
+        sqs_client: Any,
+        s3_client: Optional[S3Client] = None,
+    ) -> None:
+        if config.bucket is None and config.dlq_url is None:
+            raise ValueError("quarantine requires a bucket or a dlq_url")
+        if config.bucket is not None and s3_client is None:
+            raise ValueError("quarantine to a bucket requires an S3 client")
+        self.config = config
+        self._queue_url = queue_url
+        self._sqs_client = sqs_client
+        self._s3_client = s3_client
+
+    def exhausted(self, attrs: SqsAttrs) -> bool:
+        """Whether the message used up its attempts and must not be retried."""
+        return attrs.attempts >= self.config.max_attempts
+
+    async def quarantine(
+        self,
+        message: dict[str, Any],
+        error: Optional[BaseException] = None,
+    ) -> bool:
+        """
+        Stores the message with the error that made it fail. Returns False if
+        it could not be stored, in which case the message must not be acked.
+        """
+        record = {
+            "message_id": message.get("MessageId"),
+            "queue_url": self._queue_url,
+            "body": message.get("Body"),
+            "attributes": message.get("Attributes", {}),
+            "message_attributes": message.get("MessageAttributes", {}),
+            "error": repr(error) if error is not None else None,
+            "quarantined_at_ms": utils.time_ms(),
+        }
+        try:
+            await asyncio.to_thread(self._store, record)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception(
+                trace_codes.WORKER_QUARANTINE_FAILED,
+                context={"message_id": record["message_id"]},
+            )
+            return False
+        logger.warning(
+            trace_codes.WORKER_MESSAGE_QUARANTINED,
+            context={
+                "message_id": record["message_id"],
+                "attempts": record["attributes"].get("ApproximateReceiveCount"),
+                "error": record["error"],
+            },
+        )
+        return True
+
+    def _store(self, record: dict[str, Any]) -> None:
+        data = json.dumps(record)
+        if self.config.bucket is not None:
+            assert self._s3_client is not None
+            day = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+            self._s3_client.upload_bytes(
+                data.encode(),
+                bucket=self.config.bucket,
+                key=f"{self.config.prefix}{day}/{record['message_id']}.json",
+                content_type="application/json",
+            )
+            return
+        kwargs: dict[str, Any] = {}
+        if self.config.dlq_url and self.config.dlq_url.endswith(".fifo"):
+            # a FIFO dead letter queue rejects messages without a group
+            kwargs["MessageGroupId"] = (
+                record["attributes"].get("MessageGroupId") or QUARANTINE_GROUP_ID
+            )
+            kwargs["MessageDeduplicationId"] = record["message_id"]
+        self._sqs_client.send_message(
+            QueueUrl=self.config.dlq_url, MessageBody=data, **kwargs
+        )
+
+
+def _replay_record(sender: SQSMessageSender, record: dict[str, Any]) -> bool:
+    try:
+        body = json.loads(record["body"])
+    except (TypeError, ValueError):
+        logger.error(
+            trace_codes.WORKER_INVALID_REQUEST,
+            context={"message_id": record.get("message_id")},
+        )
+        return False
+    attributes = {
+        key: value.get("StringValue")
+        for key, value in (record.get("message_attributes") or {}).items()
+        if value.get("DataType") == "String"
+    }
+    sender.send_message(body, attributes)
+    return True
+
+
+def replay_from_s3(
+    s3_client: S3Client,
+    sender: SQSMessageSender,
+    bucket: str,
+    prefix: str,
+    delete: bool = False,
+    limit: Optional[int] = None,
+) -> int:
+    replayed = 0
+    for obj in s3_client.iter_objects(bucket, prefix=prefix):
+        if limit is not None and replayed >= limit:
+            break
+        key = obj.key
+        response = s3_client.client.get_object(Bucket=bucket, Key=key)
+        record = json.loads(response["Body"].read())
+        if not _replay_record(sender, record):
+            continue
+        if delete:
+            s3_client.client.delete_object(Bucket=bucket, Key=key)
+        replayed += 1
+    return replayed
+
+
+def replay_from_dlq(
+    sqs_client: Any,
+    sender: SQSMessageSender,
+    dlq_url: str,
+    limit: Optional[int] = None,
+) -> int:
+    replayed = 0
+    while limit is None or replayed < limit:
+        batch = 10 if limit is None else min(10, limit - replayed)
+        messages = sqs_client.receive_message(
+            QueueUrl=dlq_url,
+            MaxNumberOfMessages=batch,
+            WaitTimeSeconds=1,
+        ).get("Messages", [])
+        if not messages:
+            break
+        for message in messages:
+            if limit is not None and replayed >= limit:
+                break
+            if _replay_record(sender, json.loads(message["Body"])):
+                sqs_client.delete_message(
+                    QueueUrl=dlq_url, ReceiptHandle=message["ReceiptHandle"]
+                )
+                replayed += 1
+    return replayed
+
+
+def main():
+    """
+    Replays quarantined messages onto the worker queue.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.worker.quarantine")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay", help="send quarantined messages again")
+    replay.add_argument("--prefix", help="only replay keys below this prefix")
+    replay.add_argument("--from-dlq", action="store_true")
+    replay.add_argument(
+        "--delete", action="store_true", help="remove replayed S3 records"
+    )
+    replay.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.configure_logger(default_logger_names=["root"])
+    cfg = fetch_config()
+    sqs_cfg: AwsSQSConfig = cfg.aws.sqs
+    if sqs_cfg.quarantine is None:
+        raise SystemExit("aws.sqs.quarantine is not configured")
+    s3_client = S3Client(cfg.aws.s3)
+    sender = SQSMessageSender(sqs_cfg, s3_client=s3_client)
+
+    if args.from_dlq:
+        if sqs_cfg.quarantine.dlq_url is None:
+            raise SystemExit("aws.sqs.quarantine.dlq_url is not configured")
+        replayed = replay_from_dlq(
+            sender.sqs_client, sender, sqs_cfg.quarantine.dlq_url, limit=args.limit
+        )
+    else:
+        if sqs_cfg.quarantine.bucket is None:
+            raise SystemExit("aws.sqs.quarantine.bucket is not configured")
+        replayed = replay_from_s3(
+            s3_client,
+            sender,
+            bucket=sqs_cfg.quarantine.bucket,
+            prefix=args.prefix or sqs_cfg.quarantine.prefix,
+            delete=args.delete,
+            limit=args.limit,
+        )
+    logger.info(trace_codes.WORKER_QUARANTINE_REPLAYED, context={"replayed": replayed})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+This module provides the prefork supervisor of the worker.
+
+The supervisor forks a fixed number of consumer processes, restarts children
+which exit unexpectedly and forwards SIGTERM/SIGINT to them so that every
+child drains its in-flight messages before the supervisor exits. The target
+must install its own SIGTERM handler for that, as PooledConsumer does, and
+is expected to build its own services, so that database engines and boto3
+clients are created after the fork instead of being inherited.
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Optional
+
+from src.pkg import logging
+from src.worker import trace_codes
+
+logger = logging.get_logger()
+
+MAX_RESTART_BACKOFF_SEC = 30
+STABLE_UPTIME_SEC = 60
+
+
+def _run_child(target: Callable[[], None]) -> None:
+    # handlers of the supervisor are inherited through the fork, the child
+    # installs its own when the consumer starts
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target()
+
+
+class Supervisor:
+    def __init__(
+        self,
+        target: Callable[[], None],
+        processes: Optional[int] = None,
+        drain_timeout_sec: int = 60,
+    ) -> None:
+        self._target = target
+        self._processes = processes or os.cpu_count() or 1
+        self._drain_timeout_sec = drain_timeout_sec
+        self._ctx = multiprocessing.get_context("fork")
+        self._children: list[Optional[BaseProcess]] = [None] * self._processes
+        self._started_at: list[float] = [0.0] * self._processes
+        self._backoff_sec: list[float] = [0.0] * self._processes
+        self._restart_at: list[Optional[float]] = [None] * self._processes
+        self._stopping = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+
+        for slot in range(self._processes):
+            self._start(slot)
+
+        while not self._stopping:
+            sentinels = [child.sentinel for child in self._children if child]
+            timeout = self._next_restart_in()
+            if sentinels:
+                wait(sentinels, timeout=timeout)
+            else:
+                time.sleep(timeout)
+            if self._stopping:
+                break
+            for slot, child in enumerate(self._children):
+                if child is not None and not child.is_alive():
+                    self._on_exit(slot, child)
+            now = time.monotonic()
+            for slot, restart_at in enumerate(self._restart_at):
+                if restart_at is not None and restart_at <= now:
+                    self._restart_at[slot] = None
+                    self._start(slot)
+
+        self._drain()
+
+    def _next_restart_in(self) -> float:
+        pending = [at for at in self._restart_at if at is not None]
+        if not pending:
+            return 1.0
+        return min(max(min(pending) - time.monotonic(), 0), 1.0)
+
+    def _start(self, slot: int) -> None:
+        child = self._ctx.Process(
+            target=_run_child,
+            args=(self._target,),
+            name=f"sqs-consumer-{slot}",
+        )
+        child.start()
+        self._children[slot] = child
+        self._started_at[slot] = time.monotonic()
+        logger.info(
+            trace_codes.WORKER_PROCESS_STARTED,
+            context={"slot": slot, "pid": child.pid},
+        )
+
+    def _on_exit(self, slot: int, child: BaseProcess) -> None:
+        uptime = time.monotonic() - self._started_at[slot]
+        if uptime >= STABLE_UPTIME_SEC:
+            self._backoff_sec[slot] = 0
+        else:
+            self._backoff_sec[slot] = min(
+                max(self._backoff_sec[slot] * 2, 1), MAX_RESTART_BACKOFF_SEC
+            )
+        logger.error(
+            trace_codes.WORKER_PROCESS_EXITED,
+            context={
+                "slot": slot,
+                "pid": child.pid,
+                "exit_code": child.exitcode,
+                "uptime_sec": int(uptime),
+                "restart_in_sec": self._backoff_sec[slot],
+            },
+        )
+        child.close()
+        self._children[slot] = None
+        # a crash looping child must not turn the supervisor into a fork bomb,
+        # the restart is scheduled so that other slots keep being watched
+        self._restart_at[slot] = time.monotonic() + self._backoff_sec[slot]
+
+    def _on_signal(self, signum: int, _: Any) -> None:
+        logger.info(trace_codes.WORKER_CONSUMER_STOPPING, context={"signal": signum})
+        self._stopping = True
+        for child in self._children:
+            if child is not None and child.is_alive() and child.pid:
+                os.kill(child.pid, signal.SIGTERM)
+
+    def _drain(self) -> None:
+        deadline = time.monotonic() + self._drain_timeout_sec
+        for child in self._children:
+            if child is None:
+                continue
+            child.join(timeout=max(deadline - time.monotonic(), 0))
+            if child.is_alive():
+                child.kill()
+                child.join()
@@ -7,4 +7,17 @@ WORKER_REQUEST_INITIATED = "WORKER_REQUEST_INITIATED"
 WORKER_REQUEST_COMPLETED = "WORKER_REQUEST_COMPLETED"
 WORKER_REQUEST_FAILED = "WORKER_REQUEST_FAILED"
 WORKER_INVALID_REQUEST = "WORKER_INVALID_REQUEST"
- 
\ No newline at end of file
+WORKER_ACK_FAILED = "WORKER_ACK_FAILED"
+WORKER_CONSUMER_STARTED = "WORKER_CONSUMER_STARTED"
+WORKER_CONSUMER_STOPPING = "WORKER_CONSUMER_STOPPING"
+WORKER_VISIBILITY_EXTEND_FAILED = "WORKER_VISIBILITY_EXTEND_FAILED"
+WORKER_BATCH_FAILED = "WORKER_BATCH_FAILED"
+WORKER_PROCESS_STARTED = "WORKER_PROCESS_STARTED"
+WORKER_PROCESS_EXITED = "WORKER_PROCESS_EXITED"
+WORKER_RECEIVE_STATS = "WORKER_RECEIVE_STATS"
+WORKER_DUPLICATE_SKIPPED = "WORKER_DUPLICATE_SKIPPED"
+WORKER_DEDUPE_FAILED = "WORKER_DEDUPE_FAILED"
+WORKER_MESSAGE_QUARANTINED = "WORKER_MESSAGE_QUARANTINED"
+WORKER_QUARANTINE_FAILED = "WORKER_QUARANTINE_FAILED"
+WORKER_QUARANTINE_REPLAYED = "WORKER_QUARANTINE_REPLAYED"
+WORKER_RECEIVE_FAILED = "WORKER_RECEIVE_FAILED"
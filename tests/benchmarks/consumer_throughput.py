@@ -0,0 +1,149 @@
+"""
+Compares the throughput of the consumer modes against a moto backed queue.
+
+Every message sleeps for a fixed time in the handler to stand in for I/O, so
+the numbers show how much of that latency each mode overlaps:
+
+    python -m tests.benchmarks.consumer_throughput --messages 100 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any
+
+import boto3
+from moto import mock_aws
+from sqs_listener import SqsListener  # type: ignore
+
+from src.pkg.sqs import AwsSQSConfig, SqsConsumerMode
+from src.worker.consumer import PooledConsumer
+from src.worker.handler import MessageHandler, SqsAttrs
+
+REGION = "us-east-1"
+QUEUE_NAME = "benchmark-queue"
+
+
+class SleepingHandler(MessageHandler):
+    def __init__(self, queue_url: str, latency_sec: float) -> None:
+        super().__init__(queue_url)
+        self.latency_sec = latency_sec
+        self.processed = 0
+
+    def handle_message(self, body: Any, attributes: SqsAttrs) -> None:
+        time.sleep(self.latency_sec)
+        self.processed += 1
+
+    async def handle_message_async(self, body: Any, attributes: SqsAttrs) -> None:
+        await asyncio.sleep(self.latency_sec)
+        self.processed += 1
+
+
+class _StopListening(BaseException):
+    """Ends SqsListener.listen, which logs and swallows every Exception."""
+
+
+def bench_listener(handler: SleepingHandler, messages: int) -> float:
+    class Listener(SqsListener):
+        def handle_message(self, body: Any, attributes: Any, messages_attributes: Any):
+            handler.handle_message(body, SqsAttrs.parse(attributes))
+            if handler.processed >= messages:
+                raise _StopListening
+
+    started = time.monotonic()
+    try:
+        Listener(
+            QUEUE_NAME,
+            region_name=REGION,
+            max_number_of_messages=10,
+            wait_time=0,
+            interval=1,
+        ).listen()
+    except _StopListening:
+        pass
+    return time.monotonic() - started
+
+
+def bench_pooled(
+    handler: SleepingHandler,
+    messages: int,
+    sqs_client: Any,
+    queue_url: str,
+    mode: SqsConsumerMode,
+    max_in_flight: int,
+) -> float:
+    consumer = PooledConsumer(
+        AwsSQSConfig(
+            region=REGION,
+            queue_url=queue_url,
+            max_number_of_messages=10,
+            wait_time_sec=1,
+            consumer_mode=mode,
+            max_in_flight=max_in_flight,
+        ),
+        handler,
+        sqs_client=sqs_client,
+    )
+
+    async def run() -> float:
+        started = time.monotonic()
+        task = asyncio.create_task(
+            consumer._listen()
+        )  # pylint: disable=protected-access
+        while handler.processed < messages and not task.done():
+            await asyncio.sleep(0.005)
+        elapsed = time.monotonic() - started
+        consumer.stop()
+        await task
+        return elapsed
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.benchmarks.consumer_throughput"
+    )
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--max-in-flight", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_DEFAULT_REGION", REGION)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    # pysqslistener resolves the queue URL with the account ID
+    os.environ.setdefault("AWS_ACCOUNT_ID", "123456789012")
+
+    with mock_aws():
+        sqs_client = boto3.client("sqs", region_name=REGION)
+        queue_url = sqs_client.create_queue(QueueName=QUEUE_NAME)["QueueUrl"]
+        modes = ["listener", SqsConsumerMode.THREAD, SqsConsumerMode.ASYNCIO]
+        for mode in modes:
+            for i in range(args.messages):
+                sqs_client.send_message(
+                    QueueUrl=queue_url, MessageBody=json.dumps({"i": i})
+                )
+            handler = SleepingHandler(queue_url, args.latency_ms / 1000)
+            if mode == "listener":
+                elapsed = bench_listener(handler, args.messages)
+            else:
+                elapsed = bench_pooled(
+                    handler,
+                    args.messages,
+                    sqs_client,
+                    queue_url,
+                    mode,
+                    args.max_in_flight,
+                )
+            name = mode.value if isinstance(mode, SqsConsumerMode) else mode
+            print(
+                f"{name:<10} {args.messages} messages in {elapsed:.2f}s "
+                f"({args.messages / elapsed:.1f} msg/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
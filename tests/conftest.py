@@ -0,0 +1,29 @@
+import os
+from typing import Any, Iterator
+
+import boto3
+import pytest
+from moto import mock_aws
+
+REGION = "us-east-1"
+
+
+@pytest.fixture
+def aws() -> Iterator[None]:
+    os.environ.setdefault("AWS_DEFAULT_REGION", REGION)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def sqs_client(
+    aws: None,
+) -> Any:  # pylint: disable=unused-argument,redefined-outer-name
+    return boto3.client("sqs", region_name=REGION)
+
+
+@pytest.fixture
+def queue_url(sqs_client: Any) -> str:  # pylint: disable=redefined-outer-name
+    return sqs_client.create_queue(QueueName="worker-queue")["QueueUrl"]
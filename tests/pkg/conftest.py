@@ -0,0 +1,12 @@
+from typing import Iterator
+
+import pytest
+
+from tests.pkg.fake_salesforce import FakeSalesforce
+
+
+@pytest.fixture
+def salesforce() -> Iterator[FakeSalesforce]:
+    fake = FakeSalesforce().start()
+    yield fake
+    fake.stop()
@@ -0,0 +1,207 @@
+"""
+A fake of the Salesforce Bulk API 2.0 ingest endpoints on a stdlib HTTP
+server, to run SFClient.ingest against real HTTP without a Salesforce org.
+
+It implements the calls the client makes: the OAuth token request, job
+creation, the (chunked) CSV upload, the state PATCH, polling and
+failedResults. A job reports InProgress on its first poll after the upload
+completed and JobComplete afterwards. Records for which fail_record returns
+True are reported as failed. The first unavailable_uploads uploads are
+answered with 503 and a Retry-After header.
+"""
+
+import csv
+import io
+import itertools
+import json
+import threading
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+API_PREFIX = "/services/data/v60.0/jobs/ingest"
+AUTH_PATH = "/services/oauth2/token"
+ACCESS_TOKEN = "fake-token"
+
+
+@dataclass
+class FakeIngestJob:
+    id: str
+    request: dict[str, Any]
+    state: str = "Open"
+    csv: bytes = b""
+    chunked: bool = False
+    polls: int = 0
+
+    def records(self) -> list[dict[str, str]]:
+        return list(csv.DictReader(io.StringIO(self.csv.decode())))
+
+
+@dataclass
+class FakeSalesforce:
+    fail_record: Callable[[dict[str, str]], bool] = lambda record: False
+    fail_upload: bool = False
+    unavailable_uploads: int = 0
+    jobs: dict[str, FakeIngestJob] = field(default_factory=dict)
+    _server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "FakeSalesforce":
+        fake = self
+        ids = itertools.count(1)
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                body = self._body()
+                if self.path == AUTH_PATH:
+                    self._reply(HTTPStatus.OK, {"access_token": ACCESS_TOKEN})
+                    return
+                if not self._authorized() or self.path != API_PREFIX:
+                    return
+                with lock:
+                    job = FakeIngestJob(
+                        id=f"750{next(ids):012d}", request=json.loads(body)
+                    )
+                    fake.jobs[job.id] = job
+                self._reply(HTTPStatus.OK, {"id": job.id, "state": job.state})
+
+            def do_PUT(self) -> None:  # pylint: disable=invalid-name
+                body = self._body()
+                job = self._job("batches")
+                if job is None:
+                    return
+                job.chunked = self.headers.get("Transfer-Encoding") == "chunked"
+                job.csv = body
+                if fake.unavailable_uploads > 0:
+                    fake.unavailable_uploads -= 1
+                    self._reply(
+                        HTTPStatus.SERVICE_UNAVAILABLE,
+                        [{"errorCode": "SERVER_UNAVAILABLE"}],
+                        headers={"Retry-After": "0"},
+                    )
+                    return
+                if fake.fail_upload or job.state != "Open":
+                    self._reply(
+                        HTTPStatus.BAD_REQUEST, [{"errorCode": "INVALIDJOBSTATE"}]
+                    )
+                    return
+                self._reply(HTTPStatus.CREATED, b"")
+
+            def do_PATCH(self) -> None:  # pylint: disable=invalid-name
+                body = self._body()
+                job = self._job()
+                if job is None:
+                    return
+                job.state = json.loads(body)["state"]
+                self._reply(HTTPStatus.OK, {"id": job.id, "state": job.state})
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                if self.path.rstrip("/").endswith("/failedResults"):
+                    job = self._job("failedResults")
+                    if job is not None:
+                        self._failed_results(job)
+                    return
+                job = self._job()
+                if job is None:
+                    return
+                if job.state == "UploadComplete":
+                    job.polls += 1
+                    if job.polls > 1:
+                        job.state = "JobComplete"
+                failed = [r for r in job.records() if fake.fail_record(r)]
+                self._reply(
+                    HTTPStatus.OK,
+                    {
+                        "id": job.id,
+                        "state": (
+                            "InProgress" if job.state == "UploadComplete" else job.state
+                        ),
+                        "numberRecordsProcessed": len(job.records()),
+                        "numberRecordsFailed": len(failed),
+                    },
+                )
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _failed_results(self, job: FakeIngestJob) -> None:
+                out = io.StringIO()
+                writer = csv.writer(out, lineterminator="\n")
+                records = job.records()
+                writer.writerow(
+                    ["sf__Id", "sf__Error", *(records[0] if records else [])]
+                )
+                for record in records:
+                    if fake.fail_record(record):
+                        writer.writerow(
+                            ["", "REQUIRED_FIELD_MISSING", *record.values()]
+                        )
+                self._reply(HTTPStatus.OK, out.getvalue().encode(), "text/csv")
+
+            def _job(self, action: Optional[str] = None) -> Optional[FakeIngestJob]:
+                if not self._authorized():
+                    return None
+                parts = self.path.rstrip("/").split("/")
+                if action is not None:
+                    if parts[-1] != action:
+                        self._reply(HTTPStatus.NOT_FOUND, [{"errorCode": "NOT_FOUND"}])
+                        return None
+                    parts = parts[:-1]
+                job = fake.jobs.get(parts[-1])
+                if "/".join(parts[:-1]) != API_PREFIX or job is None:
+                    self._reply(HTTPStatus.NOT_FOUND, [{"errorCode": "NOT_FOUND"}])
+                    return None
+                return job
+
+            def _authorized(self) -> bool:
+                if self.headers.get("Authorization") == f"Bearer {ACCESS_TOKEN}":
+                    return True
+                self._reply(
+                    HTTPStatus.UNAUTHORIZED, [{"errorCode": "INVALID_SESSION_ID"}]
+                )
+                return False
+
+            def _body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding") != "chunked":
+                    return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = b""
+                while True:
+                    size = int(self.rfile.readline().strip(), 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return body
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+
+            def _reply(
+                self,
+                status: int,
+                body: Any,
+                content_type: str = "application/json",
+                headers: Optional[dict[str, str]] = None,
+            ) -> None:
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
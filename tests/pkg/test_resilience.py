@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from src.config.common import CircuitBreakerConfig, ExpRetryConfig, RateLimitConfig
+from src.pkg.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    JitteredRetry,
+    RateLimitTimeoutError,
+    TokenBucket,
+    full_jitter_backoff_ms,
+)
+
+RETRY = ExpRetryConfig(
+    interval_ms=100, max_retries=5, exponent=2, jitter_ms=10, interval_cap_ms=300
+)
+
+
+def open_breaker(reset_timeout_sec: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(
+        CircuitBreakerConfig(failure_threshold=2, reset_timeout_sec=reset_timeout_sec)
+    )
+    for _ in range(2):
+        breaker.before_call()
+        breaker.on_failure()
+    assert breaker.state == CircuitState.OPEN
+    return breaker
+
+
+def test_circuit_breaker_fails_fast_until_the_reset_timeout():
+    breaker = open_breaker()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+    # only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.on_success()
+
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_call()
+
+
+def test_circuit_breaker_reopens_on_a_failed_probe():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.on_failure()
+
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_circuit_breaker_release_frees_the_probe():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.release()
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.before_call()
+
+
+def test_token_bucket_allows_the_burst_then_waits():
+    bucket = TokenBucket(RateLimitConfig(rate_per_sec=20, burst=2))
+    assert bucket.try_acquire() == bucket.try_acquire() == 0
+    assert 0 < bucket.try_acquire() <= 0.05
+
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.03
+
+
+def test_token_bucket_acquire_times_out():
+    bucket = TokenBucket(RateLimitConfig(rate_per_sec=1))
+    bucket.acquire()
+    with pytest.raises(RateLimitTimeoutError):
+        bucket.acquire(timeout=0.1)
+
+
+def test_full_jitter_backoff_stays_below_the_cap():
+    for attempt in range(1, 10):
+        delays = [full_jitter_backoff_ms(RETRY, attempt) for _ in range(100)]
+        ceiling = min(RETRY.interval_ms * RETRY.exponent ** (attempt - 1), 300) + 10
+        assert all(0 <= delay <= min(ceiling, 300) for delay in delays)
+
+
+def test_jittered_retry_keeps_its_backoff_config():
+    retry = JitteredRetry(backoff_config=RETRY, total=3)
+    assert retry.get_backoff_time() == 0
+
+    retry = retry.increment(method="GET", url="/").increment(method="GET", url="/")
+
+    assert retry.backoff_config is RETRY
+    assert retry.total == 1
+    assert 0 <= retry.get_backoff_time() <= 0.21
@@ -0,0 +1,235 @@
+from pathlib import Path
+from typing import Any, Optional
+
+import boto3
+import pytest
+
+from src.common.types import ContentType, MimeType, UnknownMimeTypeError
+from src.pkg.s3 import AwsS3Config, S3Client
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+
+
+class FailingS3Client(S3Client):
+    def upload_bytes(
+        self,
+        data: bytes,
+        bucket: str,
+        key: str,
+        content_type: Optional[str] = None,
+    ) -> None:
+        if key.endswith("bad"):
+            raise OSError("connection reset")
+        super().upload_bytes(data, bucket, key, content_type)
+
+
+def test_upload_many_reports_failed_items(aws: Any):  # pylint: disable=unused-argument
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="uploads")
+    client = FailingS3Client(AwsS3Config(max_workers=4))
+
+    summary = client.upload_many(
+        "uploads",
+        [("a", b"1"), ("bad", b"22"), ("b", b"333")],
+        prefix="in/",
+    )
+
+    assert summary.transferred_objects == 2
+    assert summary.transferred_bytes == 4
+    assert [(result.key, result.success) for result in summary.failed] == [
+        ("in/bad", False)
+    ]
+    assert "connection reset" in summary.failed[0].error
+    keys = [obj["Key"] for obj in s3.list_objects_v2(Bucket="uploads")["Contents"]]
+    assert sorted(keys) == ["in/a", "in/b"]
+
+
+def test_pool_fits_the_parallel_part_uploads(
+    aws: Any,
+):  # pylint: disable=unused-argument
+    client = S3Client(AwsS3Config(max_workers=4, transfer_concurrency=5))
+    assert client.client.meta.config.max_pool_connections == 20
+    client = S3Client(AwsS3Config(max_workers=32, transfer_concurrency=10))
+    assert client.client.meta.config.max_pool_connections == 100
+
+
+def s3_bucket(name: str) -> Any:
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket=name)
+    return s3
+
+
+def test_iter_objects_follows_the_continuation_token(
+    aws: Any,
+):  # pylint: disable=unused-argument
+    s3 = s3_bucket("listing")
+    for i in range(1005):
+        s3.put_object(Bucket="listing", Key=f"in/{i:04d}.txt", Body=b"x")
+    s3.put_object(Bucket="listing", Key="out/other.txt", Body=b"x")
+    client = S3Client(AwsS3Config())
+
+    keys = [obj.key for obj in client.iter_objects("listing", prefix="in/")]
+
+    assert keys == [f"in/{i:04d}.txt" for i in range(1005)]
+    assert len(list(client.iter_objects("listing", prefix=""))) == 1006
+    assert not list(client.iter_objects("listing", prefix="missing/"))
+    assert not list(client.iter_objects("listing", file_name_filter="missing"))
+
+
+def test_incremental_download_skips_unchanged_objects(
+    aws: Any, tmp_path: Path
+):  # pylint: disable=unused-argument
+    s3 = s3_bucket("sync")
+    s3.put_object(Bucket="sync", Key="in/a.txt", Body=b"a")
+    s3.put_object(Bucket="sync", Key="in/b.txt", Body=b"bb")
+    client = S3Client(AwsS3Config())
+
+    first = client.download_all_files_from_bucket(
+        "sync", str(tmp_path), "in/", "", incremental=True
+    )
+    s3.put_object(Bucket="sync", Key="in/b.txt", Body=b"changed")
+    second = client.download_all_files_from_bucket(
+        "sync", str(tmp_path), "in/", "", incremental=True
+    )
+
+    assert (first.transferred_objects, first.skipped_objects) == (2, 0)
+    assert (second.transferred_objects, second.skipped_objects) == (1, 1)
+    assert second.skipped_bytes == 1
+    assert (tmp_path / "in" / "b.txt").read_bytes() == b"changed"
+
+
+def test_streams_ranges_and_spools_objects(
+    aws: Any,
+):  # pylint: disable=unused-argument
+    s3 = s3_bucket("stream")
+    data = bytes(range(256)) * 40
+    s3.put_object(
+        Bucket="stream", Key="in/data.txt", Body=data, ContentType="text/plain"
+    )
+    url = "https://stream.s3.amazonaws.com/in/data.txt"
+    client = S3Client(
+        AwsS3Config(download_chunk_size=4096, spool_max_memory_bytes=1024)
+    )
+
+    with client.open_via_url(url) as response:
+        chunks = list(response.iter_chunks())
+    assert [len(chunk) for chunk in chunks] == [4096, 4096, 2048]
+    assert b"".join(chunks) == data
+    assert response.mime_type == MimeType.TEXT
+
+    assert client.download_range(url, 10, 19) == data[10:20]
+    with client.open_via_url(url, start=10_000) as response:
+        assert response.read() == data[10_000:]
+
+    with client.spool_via_url(url) as response:
+        assert response.body._rolled  # type: ignore  # pylint: disable=protected-access
+        assert response.read(5) == data[:5]
+        response.body.seek(0)
+        assert response.read() == data
+
+
+@pytest.mark.parametrize(
+    "header,mime_type",
+    [
+        (b"%PDF-1.7\n", MimeType.PDF),
+        (PNG_HEADER, MimeType.IMAGE_PNG),
+        (b"\xff\xd8\xff\xe0\x00\x10JFIF", MimeType.IMAGE_JPEG),
+        (b"GIF89a\x01\x00", MimeType.IMAGE_GIF),
+        (b"II*\x00\x08\x00", MimeType.IMAGE_TIFF),
+        (b"RIFF\x24\x00\x00\x00WEBPVP8 ", MimeType.IMAGE_WEBP),
+        (b"BM\x36\x00\x0c\x00", MimeType.IMAGE_BMP),
+    ],
+)
+def test_from_magic_bytes(header: bytes, mime_type: MimeType):
+    assert MimeType.from_magic_bytes(header) == mime_type
+
+
+def test_from_magic_bytes_rejects_unknown_signatures():
+    with pytest.raises(UnknownMimeTypeError):
+        MimeType.from_magic_bytes(b"PK\x03\x04")
+    with pytest.raises(UnknownMimeTypeError):
+        MimeType.from_magic_bytes(b"RIFF\x24\x00\x00\x00WAVEfmt ")
+
+
+def test_probe_sniffs_the_signature(aws: Any):  # pylint: disable=unused-argument
+    s3 = s3_bucket("probe")
+    body = PNG_HEADER + b"\x00" * 100
+    s3.put_object(
+        Bucket="probe",
+        Key="in/upload",
+        Body=body,
+        ContentType="application/octet-stream",
+    )
+    s3.put_object(
+        Bucket="probe",
+        Key="in/scan.pdf",
+        Body=PNG_HEADER,
+        ContentType="application/pdf",
+    )
+    s3.put_object(Bucket="probe", Key="in/blob", Body=b"PK\x03\x04")
+    client = S3Client(AwsS3Config())
+
+    result = client.probe("https://probe.s3.amazonaws.com/in/upload")
+    assert (result.mime_type, result.size, result.sniffed) == (
+        MimeType.IMAGE_PNG,
+        len(body),
+        True,
+    )
+    assert result.content_type == ContentType.IMAGE
+
+    result = client.probe("https://probe.s3.amazonaws.com/in/scan.pdf")
+    assert (result.mime_type, result.sniffed) == (MimeType.PDF, False)
+    result = client.probe("https://probe.s3.amazonaws.com/in/scan.pdf", sniff=True)
+    assert (result.mime_type, result.sniffed) == (MimeType.IMAGE_PNG, True)
+
+    result = client.probe("https://probe.s3.amazonaws.com/in/blob")
+    assert (result.mime_type, result.content_type) == (None, None)
+
+
+class CountingS3Client(S3Client):
+    def __init__(self, cfg: AwsS3Config):
+        super().__init__(cfg)
+        self.delete_calls: list[int] = []
+        self.client.meta.events.register(
+            "before-call.s3.DeleteObjects", self._count_keys
+        )
+
+    def _count_keys(self, params: dict[str, Any], **_: Any) -> None:
+        self.delete_calls.append(params["body"].count(b"<Key>"))
+
+
+def test_delete_many_chunks_the_keys(aws: Any):  # pylint: disable=unused-argument
+    s3 = s3_bucket("cleanup")
+    keys = [f"in/{i:04d}" for i in range(1500)]
+    for key in keys:
+        s3.put_object(Bucket="cleanup", Key=key, Body=b"x")
+    client = CountingS3Client(AwsS3Config())
+
+    results = client.delete_many("cleanup", keys + ["in/missing"])
+
+    assert client.delete_calls == [1000, 501]
+    assert [result.key for result in results] == keys + ["in/missing"]
+    assert all(result.success for result in results)
+    assert "Contents" not in s3.list_objects_v2(Bucket="cleanup")
+
+
+def test_move_many_keeps_sources_which_failed_to_copy(
+    aws: Any,
+):  # pylint: disable=unused-argument
+    s3 = s3_bucket("moves")
+    s3.put_object(Bucket="moves", Key="in/a", Body=b"a")
+    s3.put_object(Bucket="moves", Key="in/b", Body=b"b")
+    client = S3Client(AwsS3Config(max_workers=2))
+
+    results = client.move_many(
+        "moves",
+        [("in/a", "done/a"), ("in/missing", "done/missing"), ("in/b", "done/b")],
+    )
+
+    assert [(result.key, result.success) for result in results] == [
+        ("in/a", True),
+        ("in/missing", False),
+        ("in/b", True),
+    ]
+    keys = [obj["Key"] for obj in s3.list_objects_v2(Bucket="moves")["Contents"]]
+    assert sorted(keys) == ["done/a", "done/b"]
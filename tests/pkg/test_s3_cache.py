@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Any, Optional
+
+import boto3
+
+from src.pkg.s3 import AwsS3Config, S3Client
+from src.pkg.s3_cache import DATA_SUFFIX, S3CacheConfig, S3CacheEntry
+
+
+def cached_client(directory: Path, **kwargs: Any) -> S3Client:
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="cached")
+    return S3Client(
+        AwsS3Config(cache=S3CacheConfig(directory=str(directory), **kwargs))
+    )
+
+
+def put(client: S3Client, key: str, body: bytes) -> str:
+    client.client.put_object(
+        Bucket="cached", Key=key, Body=body, ContentType="text/plain"
+    )
+    return f"https://cached.s3.amazonaws.com/{key}"
+
+
+def cached_files(directory: Path) -> list[Path]:
+    return list(directory.glob(f"*/*{DATA_SUFFIX}"))
+
+
+def test_serves_repeated_downloads_from_the_cache(
+    aws: Any, tmp_path: Path
+):  # pylint: disable=unused-argument
+    client = cached_client(tmp_path)
+    url = put(client, "in/a.txt", b"first")
+
+    assert client.download_via_url(url).file_data == b"first"
+    with client.map_via_url(url) as response:
+        assert response.file_data[:] == b"first"
+    put(client, "in/a.txt", b"second")
+    assert client.download_via_url(url).file_data == b"second"
+
+    stats = client.cache_stats()
+    assert stats is not None
+    assert (stats.hits, stats.revalidations, stats.misses) == (1, 1, 2)
+
+
+def test_does_not_cache_objects_larger_than_the_cache(
+    aws: Any, tmp_path: Path
+):  # pylint: disable=unused-argument
+    client = cached_client(tmp_path, max_bytes=10)
+    url = put(client, "in/large.txt", b"x" * 11)
+
+    assert client.download_via_url(url).file_data == b"x" * 11
+    with client.map_via_url(url) as response:
+        assert response.file_data == b"x" * 11
+    assert not cached_files(tmp_path)
+
+
+def test_evicts_older_entries_but_not_the_stored_one(
+    aws: Any, tmp_path: Path
+):  # pylint: disable=unused-argument
+    client = cached_client(tmp_path, max_bytes=10)
+    first = put(client, "in/a.txt", b"a" * 6)
+    second = put(client, "in/b.txt", b"b" * 10)
+
+    client.download_via_url(first)
+    assert client.download_via_url(second).file_data == b"b" * 10
+
+    assert [path.stat().st_size for path in cached_files(tmp_path)] == [10]
+    stats = client.cache_stats()
+    assert stats is not None
+    assert (stats.evictions, stats.evicted_bytes) == (1, 6)
+
+
+def test_downloads_again_when_an_entry_is_evicted_before_the_read(
+    aws: Any, tmp_path: Path
+):  # pylint: disable=unused-argument
+    client = cached_client(tmp_path, revalidate=False)
+    url = put(client, "in/a.txt", b"data")
+    client.download_via_url(url)
+    assert client.cache is not None
+    lookup = client.cache.lookup
+
+    def evicted_lookup(bucket: str, key: str) -> Optional[S3CacheEntry]:
+        # another process evicts the entry right after it was looked up
+        entry = lookup(bucket, key)
+        if entry is not None:
+            entry.path.unlink()
+        return entry
+
+    client.cache.lookup = evicted_lookup  # type: ignore
+    assert client.download_via_url(url).file_data == b"data"
+    with client.map_via_url(url) as response:
+        assert response.file_data[:] == b"data"
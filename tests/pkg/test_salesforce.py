@@ -0,0 +1,194 @@
+import time
+from typing import Any, Optional
+
+import pytest
+import requests
+
+from src.config.common import CircuitBreakerConfig, ExpRetryConfig, RateLimitConfig
+from src.pkg.resilience import CircuitOpenError, CircuitState, RateLimitTimeoutError
+from src.pkg.salesforce import (
+    SalesforceConfig,
+    SalesforcePushError,
+    SfData,
+    SfIngestOperation,
+    SFClient,
+)
+from tests.pkg.fake_salesforce import FakeSalesforce
+
+
+def sf_config(
+    instance_url: str = "http://127.0.0.1:1", **kwargs: Any
+) -> SalesforceConfig:
+    return SalesforceConfig(
+        instance_url=instance_url,
+        client_id="client",
+        client_secret="secret",
+        username="user",
+        password="password",
+        auth_url="/services/oauth2/token",
+        auth_token_expiry_sec=3600,
+        **{"retry": None, **kwargs},
+    )
+
+
+class ScriptedClient(SFClient):
+    """Fails the pushes of a chunk with the errors scripted for its first row."""
+
+    def __init__(self, failures: dict[int, list[Exception]]) -> None:
+        super().__init__(sf_config(bulk_chunk_size=1, bulk_chunk_retries=3))
+        self.failures = failures
+        self.calls: dict[int, int] = {}
+
+    def push_data(
+        self,
+        sf_endpoint: str,
+        data_list: Optional[list[SfData]] = None,
+        raw_data: Optional[Any] = None,
+    ) -> dict[str, Any]:
+        row = raw_data[0]["data"][0]["row"]
+        self.calls[row] = self.calls.get(row, 0) + 1
+        errors = self.failures.get(row, [])
+        if self.calls[row] <= len(errors):
+            raise errors[self.calls[row] - 1]
+        return {"failed_rows": [], "success_rows": [row]}
+
+
+def push_error(code: int) -> SalesforcePushError:
+    return SalesforcePushError({"code": code, "content": b""})
+
+
+def test_push_data_bulk_only_retries_transient_failures():
+    client = ScriptedClient(
+        {
+            0: [push_error(503), requests.ConnectionError()],
+            1: [push_error(400)],
+            2: [push_error(401)],
+            3: [push_error(401), push_error(401)],
+            4: [push_error(429), push_error(404)],
+        }
+    )
+
+    result = client.push_data_bulk(
+        "/sync", [SfData(data=[{"row": row}]) for row in range(6)]
+    )
+
+    assert sorted(result["success_rows"]) == [0, 2, 5]
+    assert [
+        chunk["rows"][0]["data"][0]["row"] for chunk in result["failed_chunks"]
+    ] == [
+        1,
+        3,
+        4,
+    ]
+    assert client.calls == {0: 3, 1: 1, 2: 2, 3: 2, 4: 2, 5: 1}
+
+
+def ingest_client(salesforce: FakeSalesforce, **kwargs: Any) -> SFClient:
+    return SFClient(sf_config(salesforce.url, bulk_poll_interval_sec=0.01, **kwargs))
+
+
+def test_ingest_splits_the_upload_into_jobs(salesforce: FakeSalesforce):
+    salesforce.fail_record = lambda record: record["Name"] == "Acme 13"
+    client = ingest_client(salesforce, bulk_ingest_max_bytes=400)
+    # a generator, ingest must not need the records up front
+    data = (
+        SfData(
+            data=[
+                {"Ext__c": i * 10 + k, "Name": f"Acme {i * 10 + k}"} for k in range(10)
+            ]
+        )
+        for i in range(5)
+    )
+
+    results = client.ingest(
+        "Account", data, SfIngestOperation.UPSERT, external_id_field="Ext__c"
+    )
+
+    jobs = list(salesforce.jobs.values())
+    assert len(jobs) == len(results) > 1
+    assert all(len(job.csv) <= 400 and job.chunked for job in jobs)
+    assert jobs[0].request == {
+        "object": "Account",
+        "operation": "upsert",
+        "contentType": "CSV",
+        "lineEnding": "LF",
+        "externalIdFieldName": "Ext__c",
+    }
+    uploaded = [int(record["Ext__c"]) for job in jobs for record in job.records()]
+    assert uploaded == list(range(50))
+    assert all(result.state == "JobComplete" for result in results)
+    assert sum(result.records_processed for result in results) == 50
+    failed = [row for result in results for row in result.failed_results]
+    assert [(row["sf__Error"], row["Name"]) for row in failed] == [
+        ("REQUIRED_FIELD_MISSING", "Acme 13")
+    ]
+
+
+def test_ingest_aborts_the_job_of_a_failed_upload(salesforce: FakeSalesforce):
+    salesforce.fail_upload = True
+    client = ingest_client(salesforce)
+
+    with pytest.raises(SalesforcePushError):
+        client.ingest("Account", [SfData(data=[{"Name": "Acme"}])])
+
+    assert [job.state for job in salesforce.jobs.values()] == ["Aborted"]
+
+
+def test_ingest_does_not_retry_the_upload(salesforce: FakeSalesforce):
+    # a retry would resend the already consumed CSV generator as an empty body
+    salesforce.unavailable_uploads = 1
+    client = ingest_client(
+        salesforce,
+        retry=ExpRetryConfig(
+            interval_ms=1, max_retries=3, exponent=0, jitter_ms=1, interval_cap_ms=1
+        ),
+    )
+
+    with pytest.raises(SalesforcePushError):
+        client.ingest("Account", [SfData(data=[{"Name": "Acme"}])])
+
+    assert [job.state for job in salesforce.jobs.values()] == ["Aborted"]
+
+
+def guarded_client(salesforce: FakeSalesforce) -> SFClient:
+    client = SFClient(
+        sf_config(
+            salesforce.url,
+            rate_limit=RateLimitConfig(rate_per_sec=1, max_wait_sec=0.1),
+            circuit_breaker=CircuitBreakerConfig(
+                failure_threshold=1, reset_timeout_sec=0.05
+            ),
+        )
+    )
+    assert client.circuit_breaker is not None
+    client.circuit_breaker.on_failure()
+    return client
+
+
+def test_open_circuit_fails_before_taking_a_token(salesforce: FakeSalesforce):
+    client = guarded_client(salesforce)
+    url = f"{salesforce.url}/services/data/v60.0/jobs/ingest"
+
+    with pytest.raises(CircuitOpenError):
+        client._request("GET", url)  # pylint: disable=protected-access
+
+    assert client.rate_limiter is not None
+    assert client.rate_limiter.try_acquire() == 0
+
+
+def test_rate_limit_timeout_releases_the_probe(salesforce: FakeSalesforce):
+    client = guarded_client(salesforce)
+    url = f"{salesforce.url}/services/data/v60.0/jobs/ingest"
+    assert client.rate_limiter is not None
+    client.rate_limiter.acquire()
+    time.sleep(0.06)
+
+    with pytest.raises(RateLimitTimeoutError):
+        client._request("GET", url)  # pylint: disable=protected-access
+
+    # the probe was not sent, the next call may probe once a token is free
+    assert client.circuit_breaker is not None
+    assert client.circuit_breaker.state == CircuitState.HALF_OPEN
+    client.rate_limiter = None
+    client._request("GET", url)  # pylint: disable=protected-access
+    assert client.circuit_breaker.state == CircuitState.CLOSED
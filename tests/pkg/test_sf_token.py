@@ -0,0 +1,45 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.pkg.sf_token import AccessToken, SfTokenProvider
+
+
+class SlowFetch:
+    def __init__(self) -> None:
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self) -> AccessToken:
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(timeout=5)
+        return AccessToken(token="fresh", expires_at=time.time() + 3600)
+
+
+def test_get_does_not_wait_for_an_early_refresh():
+    fetch = SlowFetch()
+    provider = SfTokenProvider(
+        fetch=fetch,
+        refresh_before_sec=300,
+        token=AccessToken(token="expiring", expires_at=time.time() + 120),
+    )
+
+    assert provider.get() == "expiring"
+    assert fetch.started.wait(timeout=5)
+    try:
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tokens = list(executor.map(lambda _: provider.get(), range(32)))
+        elapsed = time.monotonic() - started
+    finally:
+        fetch.release.set()
+
+    assert tokens == ["expiring"] * 32
+    assert elapsed < 1
+    assert fetch.calls == 1
+    deadline = time.monotonic() + 5
+    while provider.get() != "fresh" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert provider.get() == "fresh"
@@ -0,0 +1,96 @@
+import json
+import re
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from src.pkg.s3 import AwsS3Config, S3Client
+from src.pkg.sqs import (
+    AwsSQSConfig,
+    SqsClaimCheckConfig,
+    SqsConsumerMode,
+    SqsGroupStrategy,
+    SqsMessageGroupConfig,
+    SQSMessageSender,
+)
+
+
+def test_failed_claim_check_upload_only_fails_its_message(
+    sqs_client: Any, queue_url: str
+):
+    # the bucket does not exist, so the upload of the large body fails
+    sender = SQSMessageSender(
+        AwsSQSConfig(
+            region="us-east-1",
+            queue_url=queue_url,
+            claim_check=SqsClaimCheckConfig(bucket="missing", threshold_bytes=100),
+        ),
+        s3_client=S3Client(AwsS3Config()),
+    )
+
+    results = sender.send_messages([{"i": 0}, {"i": 1, "pad": "x" * 200}, {"i": 2}])
+
+    assert [result.error is None for result in results] == [True, False, True]
+    messages = sqs_client.receive_message(
+        QueueUrl=queue_url, MaxNumberOfMessages=10
+    ).get("Messages", [])
+    assert sorted(json.loads(m["Body"])["i"] for m in messages) == [0, 2]
+
+
+def test_field_group_ids_are_valid_for_sqs(
+    aws: None,
+):  # pylint: disable=unused-argument
+    sender = SQSMessageSender(
+        AwsSQSConfig(
+            region="us-east-1",
+            queue_url="https://sqs.us-east-1.amazonaws.com/123456789012/queue.fifo",
+            message_group=SqsMessageGroupConfig(
+                strategy=SqsGroupStrategy.FIELD, field="customer"
+            ),
+        )
+    )
+
+    def group_id(customer: str) -> str:
+        return sender._build_entry(
+            {"customer": customer}, None
+        )[  # pylint: disable=protected-access
+            "MessageGroupId"
+        ]
+
+    assert group_id("acme-42") == "acme-42"
+    for customer in ("Zürich", "with space", "x" * 129, ""):
+        assert re.fullmatch(r"[0-9a-f]{64}", group_id(customer))
+    assert group_id("x" * 129) != group_id("x" * 130)
+
+
+@pytest.mark.parametrize(
+    "option",
+    [
+        {"prefork": True},
+        {"dedupe": {}},
+        {"quarantine": {"dlq_url": "dlq"}},
+        {"visibility_timeout_sec": 30},
+        {"batch_mode": True},
+    ],
+)
+def test_listener_mode_rejects_pooled_options(option: dict):
+    with pytest.raises(ValidationError, match="requires consumer_mode"):
+        AwsSQSConfig(region="us-east-1", queue_url="queue", **option)
+    AwsSQSConfig(
+        region="us-east-1",
+        queue_url="queue",
+        consumer_mode=SqsConsumerMode.THREAD,
+        **option,
+    )
+
+
+def test_send_messages_rejects_lists_of_other_lengths(
+    aws: None,
+):  # pylint: disable=unused-argument
+    sender = SQSMessageSender(AwsSQSConfig(region="us-east-1", queue_url="queue"))
+
+    with pytest.raises(ValueError, match="one entry per message"):
+        sender.send_messages([{"i": 0}, {"i": 1}], message_attributes=[{"a": "b"}])
+    with pytest.raises(ValueError, match="one entry per message"):
+        sender.send_messages([{"i": 0}], group_keys=["a", "b"])
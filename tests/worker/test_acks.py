@@ -0,0 +1,88 @@
+import asyncio
+import json
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from src.pkg.sqs import AwsSQSConfig, SqsConsumerMode
+from src.worker.acks import AckBatcher, VisibilityHeartbeat
+
+
+class RecordingClient:
+    """Delegates to the SQS client, recording the entries of batch calls."""
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+        self.batches: list[int] = []
+
+    def delete_message_batch(self, **kwargs: Any) -> Any:
+        self.batches.append(len(kwargs["Entries"]))
+        return self._client.delete_message_batch(**kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def receive(sqs_client: Any, queue_url: str, count: int, **kwargs: Any) -> list:
+    messages: list = []
+    while len(messages) < count:
+        messages += sqs_client.receive_message(
+            QueueUrl=queue_url, MaxNumberOfMessages=10, **kwargs
+        ).get("Messages", [])
+    return messages
+
+
+def test_ack_batcher_deletes_in_batches(sqs_client: Any, queue_url: str):
+    for i in range(25):
+        sqs_client.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"i": i}))
+    messages = receive(sqs_client, queue_url, 25)
+    client = RecordingClient(sqs_client)
+
+    async def run() -> None:
+        acks = AckBatcher(client, queue_url, batch_size=10, flush_interval_ms=50)
+        task = asyncio.create_task(acks.run())
+        for message in messages:
+            acks.ack(message)
+        await acks.join()
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert client.batches == [10, 10, 5]
+    attributes = sqs_client.get_queue_attributes(
+        QueueUrl=queue_url, AttributeNames=["ApproximateNumberOfMessagesNotVisible"]
+    )["Attributes"]
+    assert attributes["ApproximateNumberOfMessagesNotVisible"] == "0"
+
+
+def test_heartbeat_keeps_tracked_messages_invisible(sqs_client: Any, queue_url: str):
+    for i in range(2):
+        sqs_client.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"i": i}))
+    tracked, untracked = receive(sqs_client, queue_url, 2, VisibilityTimeout=1)
+
+    async def run() -> None:
+        heartbeat = VisibilityHeartbeat(
+            sqs_client, queue_url, visibility_timeout_sec=1, interval_sec=0.3
+        )
+        heartbeat.track(tracked)
+        task = asyncio.create_task(heartbeat.run())
+        await asyncio.sleep(1.6)
+        task.cancel()
+
+    asyncio.run(run())
+
+    visible = sqs_client.receive_message(
+        QueueUrl=queue_url, MaxNumberOfMessages=10
+    ).get("Messages", [])
+    assert [m["MessageId"] for m in visible] == [untracked["MessageId"]]
+
+
+def test_heartbeat_must_run_within_the_visibility_timeout():
+    with pytest.raises(ValidationError, match="heartbeat_interval_sec"):
+        AwsSQSConfig(
+            region="us-east-1",
+            queue_url="queue",
+            consumer_mode=SqsConsumerMode.ASYNCIO,
+            visibility_timeout_sec=5,
+        )
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+from typing import Any, Callable
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from src.pkg.sqs import AwsSQSConfig, SqsConsumerMode
+from src.worker.consumer import PooledConsumer
+from src.worker.handler import BatchResult, MessageHandler, SqsAttrs
+
+MESSAGES = 25
+
+
+class RecordingHandler(MessageHandler):
+    def __init__(self, queue_url: str) -> None:
+        super().__init__(queue_url)
+        self.bodies: list[Any] = []
+
+    def handle_message(self, body: Any, attributes: SqsAttrs) -> None:
+        time.sleep(0.01)
+        self.bodies.append(body)
+
+
+def run_until(consumer: PooledConsumer, done: Callable[[], bool], timeout: float = 10):
+    """Runs the consumer until done() holds, then stops it and waits for the drain."""
+
+    async def run() -> None:
+        task = asyncio.create_task(
+            consumer._listen()
+        )  # pylint: disable=protected-access
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline and not task.done():
+            await asyncio.sleep(0.01)
+        consumer.stop()
+        await task
+
+    asyncio.run(run())
+
+
+def send(sqs_client: Any, queue_url: str, count: int) -> None:
+    for i in range(count):
+        sqs_client.send_message(QueueUrl=queue_url, MessageBody=json.dumps({"i": i}))
+
+
+def visible_messages(sqs_client: Any, queue_url: str) -> int:
+    attributes = sqs_client.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=[
+            "ApproximateNumberOfMessages",
+            "ApproximateNumberOfMessagesNotVisible",
+        ],
+    )["Attributes"]
+    return int(attributes["ApproximateNumberOfMessages"]) + int(
+        attributes["ApproximateNumberOfMessagesNotVisible"]
+    )
+
+
+@pytest.mark.parametrize("mode", [SqsConsumerMode.THREAD, SqsConsumerMode.ASYNCIO])
+def test_processes_and_acks_every_message(sqs_client: Any, queue_url: str, mode):
+    send(sqs_client, queue_url, MESSAGES)
+    handler = RecordingHandler(queue_url)
+    consumer = PooledConsumer(
+        AwsSQSConfig(
+            region="us-east-1",
+            queue_url=queue_url,
+            max_number_of_messages=10,
+            wait_time_sec=0,
+            poll_interval_sec=1,
+            consumer_mode=mode,
+            max_in_flight=5,
+        ),
+        handler,
+        sqs_client=sqs_client,
+    )
+
+    run_until(consumer, lambda: len(handler.bodies) >= MESSAGES)
+
+    assert sorted(body["i"] for body in handler.bodies) == list(range(MESSAGES))
+    assert visible_messages(sqs_client, queue_url) == 0
+
+
+class FlakyClient:
+    """Delegates to the SQS client, failing the given receive calls."""
+
+    def __init__(self, client: Any, failures: dict[int, Exception]) -> None:
+        self._client = client
+        self._failures = failures
+        self.receives = 0
+
+    def receive_message(self, **kwargs: Any) -> Any:
+        self.receives += 1
+        if self.receives in self._failures:
+            raise self._failures[self.receives]
+        return self._client.receive_message(**kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def pooled_config(queue_url: str) -> AwsSQSConfig:
+    return AwsSQSConfig(
+        region="us-east-1",
+        queue_url=queue_url,
+        max_number_of_messages=10,
+        wait_time_sec=0,
+        poll_interval_sec=1,
+        min_poll_interval_ms=10,
+        consumer_mode=SqsConsumerMode.ASYNCIO,
+        max_in_flight=5,
+    )
+
+
+def test_receive_errors_are_retried(sqs_client: Any, queue_url: str):
+    send(sqs_client, queue_url, MESSAGES)
+    handler = RecordingHandler(queue_url)
+    client = FlakyClient(
+        sqs_client, {2: EndpointConnectionError(endpoint_url=queue_url)}
+    )
+    consumer = PooledConsumer(pooled_config(queue_url), handler, sqs_client=client)
+
+    run_until(consumer, lambda: len(handler.bodies) >= MESSAGES)
+
+    assert len(handler.bodies) == MESSAGES
+    assert client.receives > 2
+
+
+def test_unexpected_receive_error_fails_the_consumer(sqs_client: Any, queue_url: str):
+    handler = RecordingHandler(queue_url)
+    client = FlakyClient(sqs_client, {1: RuntimeError("boom")})
+    consumer = PooledConsumer(pooled_config(queue_url), handler, sqs_client=client)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run_until(consumer, lambda: False, timeout=2)
+
+
+class BatchRecordingHandler(RecordingHandler):
+    def __init__(self, queue_url: str) -> None:
+        super().__init__(queue_url)
+        self.batch_sizes: list[int] = []
+
+    def handle_batch(
+        self, bodies: list[Any], attributes: list[SqsAttrs]
+    ) -> BatchResult:
+        self.batch_sizes.append(len(bodies))
+        self.bodies.extend(bodies)
+        return BatchResult()
+
+
+def test_batch_mode_batches_the_messages_of_a_receive(sqs_client: Any, queue_url: str):
+    send(sqs_client, queue_url, 30)
+    handler = BatchRecordingHandler(queue_url)
+    config = pooled_config(queue_url).model_copy(
+        update={"batch_mode": True, "batch_window_ms": 0, "max_in_flight": 20}
+    )
+    consumer = PooledConsumer(config, handler, sqs_client=sqs_client)
+
+    run_until(consumer, lambda: len(handler.bodies) >= 30)
+
+    assert handler.batch_sizes == [10, 10, 10]
+    assert visible_messages(sqs_client, queue_url) == 0
@@ -0,0 +1,53 @@
+import json
+from typing import Any
+
+import boto3
+
+from src.pkg.s3 import AwsS3Config, S3Client
+from src.pkg.sqs import (
+    AwsSQSConfig,
+    ClaimCheckResolver,
+    SqsConsumerMode,
+    SqsClaimCheckConfig,
+    SqsDedupeConfig,
+    SQSMessageSender,
+)
+from src.worker.dedupe import IdempotencyGuard
+
+DEDUPE = SqsDedupeConfig(key_field="order.id")
+
+
+def sent_key(sqs_client: Any, queue_url: str, body: dict) -> tuple[bool, str]:
+    """Sends body through a claim checking sender and returns the consumer side key."""
+    sender = SQSMessageSender(
+        AwsSQSConfig(
+            region="us-east-1",
+            queue_url=queue_url,
+            consumer_mode=SqsConsumerMode.ASYNCIO,
+            dedupe=DEDUPE,
+            claim_check=SqsClaimCheckConfig(bucket="claims", threshold_bytes=100),
+        ),
+        s3_client=S3Client(AwsS3Config()),
+    )
+    sender.send_message(body)
+    message = sqs_client.receive_message(QueueUrl=queue_url)["Messages"][0]
+    sqs_client.delete_message(
+        QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"]
+    )
+    received = json.loads(message["Body"])
+    key = IdempotencyGuard(DEDUPE).key(message, received)
+    if key == message["MessageId"]:
+        key = "<message id>"
+    return ClaimCheckResolver.is_pointer(received), key
+
+
+def test_offloaded_bodies_keep_their_dedupe_key(sqs_client: Any, queue_url: str):
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="claims")
+
+    assert sent_key(sqs_client, queue_url, {"order": {"id": 7}}) == (False, "7")
+    assert sent_key(sqs_client, queue_url, {"order": {"id": 7}, "pad": "x" * 200}) == (
+        True,
+        "7",
+    )
+    # without the field an offloaded body falls back to its message id
+    assert sent_key(sqs_client, queue_url, {"pad": "x" * 200}) == (True, "<message id>")
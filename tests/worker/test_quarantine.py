@@ -0,0 +1,53 @@
+import asyncio
+import json
+from typing import Any
+
+from src.pkg.sqs import AwsSQSConfig, SqsQuarantineConfig, SQSMessageSender
+from src.worker.quarantine import Quarantine, replay_from_dlq
+
+
+def fifo_dlq(sqs_client: Any) -> str:
+    return sqs_client.create_queue(
+        QueueName="worker-dlq.fifo", Attributes={"FifoQueue": "true"}
+    )["QueueUrl"]
+
+
+def quarantine_messages(quarantine: Quarantine, count: int) -> None:
+    for i in range(count):
+        message = {
+            "MessageId": f"message-{i}",
+            "Body": json.dumps({"i": i}),
+            "Attributes": {"ApproximateReceiveCount": "5"},
+        }
+        assert asyncio.run(quarantine.quarantine(message, ValueError("poison")))
+
+
+def test_quarantines_to_a_fifo_dlq(sqs_client: Any, queue_url: str):
+    dlq_url = fifo_dlq(sqs_client)
+    quarantine = Quarantine(SqsQuarantineConfig(dlq_url=dlq_url), queue_url, sqs_client)
+
+    quarantine_messages(quarantine, 2)
+    # a redelivered message is deduplicated by its message id
+    quarantine_messages(quarantine, 1)
+
+    messages = sqs_client.receive_message(QueueUrl=dlq_url, MaxNumberOfMessages=10).get(
+        "Messages", []
+    )
+    assert [json.loads(m["Body"])["message_id"] for m in messages] == [
+        "message-0",
+        "message-1",
+    ]
+
+
+def test_replay_from_dlq_stops_at_the_limit(sqs_client: Any, queue_url: str):
+    dlq_url = fifo_dlq(sqs_client)
+    quarantine = Quarantine(SqsQuarantineConfig(dlq_url=dlq_url), queue_url, sqs_client)
+    quarantine_messages(quarantine, 5)
+    sender = SQSMessageSender(AwsSQSConfig(region="us-east-1", queue_url=queue_url))
+
+    assert replay_from_dlq(sqs_client, sender, dlq_url, limit=3) == 3
+
+    replayed = sqs_client.receive_message(
+        QueueUrl=queue_url, MaxNumberOfMessages=10
+    ).get("Messages", [])
+    assert sorted(json.loads(m["Body"])["i"] for m in replayed) == [0, 1, 2]